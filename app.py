@@ -1,8 +1,17 @@
 import streamlit as st
-import pandas as pd
 from src.rag_pipeline import RAGPipeline
+from src.router import QueryRouter
 from src.text2sql_pipeline import Text2SQLPipeline
+import logging
 import os
+import time
+from src.metrics import METRICS, start_metrics_server
+from src.resources import RESOURCES
+
+# Pipelines log at DEBUG on hot paths; raise LOG_LEVEL to see them
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+
+run_started = time.perf_counter()
 
 # Page Config
 st.set_page_config(
@@ -14,26 +23,74 @@ st.set_page_config(
 # Initialize Pipelines (Cached)
 @st.cache_resource
 def get_rag_pipeline():
-    rag = RAGPipeline()
+    start = time.perf_counter()
+    rag = RAGPipeline(
+        backend=os.getenv("RAG_BACKEND", "chroma"),
+        quantization=os.getenv("RAG_QUANTIZATION") or None
+    )
     # Ensure data is loaded (in a real app, this might be separate)
     if os.path.exists('data/gold/claims_master.csv'):
         rag.ingest('data/gold/claims_master.csv')
+    RESOURCES.load_seconds[("rag_pipeline",)] = time.perf_counter() - start
     return rag
 
 @st.cache_resource
 def get_text2sql_pipeline():
+    start = time.perf_counter()
     t2s = Text2SQLPipeline()
     if os.path.exists('data/gold/claims_master.csv'):
         t2s.load_data('data/gold/claims_master.csv')
+    RESOURCES.load_seconds[("text2sql_pipeline",)] = time.perf_counter() - start
     return t2s
 
+@st.cache_resource
+def get_router(_rag, _t2s):
+    return QueryRouter(_rag, _t2s)
+
+@st.cache_resource
+def get_metrics_server(port):
+    # Prometheus scrape target at http://127.0.0.1:<port>/metrics, one per process
+    return start_metrics_server(port)
+
+if os.getenv("METRICS_PORT"):
+    get_metrics_server(int(os.getenv("METRICS_PORT")))
+
 try:
     rag = get_rag_pipeline()
     t2s = get_text2sql_pipeline()
+    router = get_router(rag, t2s)
 except Exception as e:
     st.error(f"Error initializing pipelines: {e}")
     st.stop()
 
+def render_result(pager, key):
+    """Show one page of a streamed SQL result; other pages are fetched when selected."""
+    total = pager.total_rows()
+    page = 1
+    if pager.num_pages() > 1:
+        page = st.number_input("Page", min_value=1, max_value=pager.num_pages(), value=1, key=key)
+    st.dataframe(pager.page(page - 1))
+    first = (page - 1) * pager.page_size
+    shown = min(total, pager.max_rows)
+    caption = f"Rows {first + 1}-{min(first + pager.page_size, shown)} of {total}"
+    if pager.truncated:
+        caption += f" (browsing capped at the first {pager.max_rows})"
+    st.caption(caption)
+
+def render_debug(trace):
+    """Stage timings and counters of the last question, plus aggregates across all questions."""
+    with st.expander("🔧 Debug: last question"):
+        spans = [r for r in trace if "stage" in r]
+        counters = [r for r in trace if "counter" in r]
+        if spans:
+            st.dataframe(spans)
+            st.caption(f"Total across stages: {sum(r['ms'] for r in spans):.0f} ms (nested stages overlap)")
+        if counters:
+            st.dataframe(counters)
+    with st.expander("🔧 Debug: all questions"):
+        st.dataframe(METRICS.summary())
+        st.json(METRICS.counters())
+
 # UI Layout
 st.title("🏥 RAG-Powered Claims Query Assistant")
 st.markdown("Ask questions about insurance claims using **Natural Language**.")
@@ -43,31 +100,59 @@ with st.sidebar:
     st.header("⚙️ Settings")
     query_method = st.radio(
         "Query Method",
-        ["RAG (Vector Search)", "Text2SQL (Structured Query)"],
-        help="Choose 'RAG' for semantic search over text descriptions, or 'Text2SQL' for precise aggregation and filtering."
+        ["Auto", "RAG (Vector Search)", "Text2SQL (Structured Query)"],
+        help="'Auto' picks the method per question (both when unclear). Choose 'RAG' for semantic search over "
+             "text descriptions, or 'Text2SQL' for precise aggregation and filtering."
     )
     
     st.markdown("---")
     st.markdown("### Data Info")
-    if os.path.exists('data/gold/claims_master.csv'):
-        df = pd.read_csv('data/gold/claims_master.csv')
-        st.info(f"Loaded {len(df)} claims.")
+    # Counts and filter values come from the DuckDB catalog/schema cache, not a CSV read per rerun
+    summary = None
+    if t2s.data_version is not None:
+        summary = t2s.column_summary()
+        st.info(f"Loaded {t2s.row_count()} claims.")
     else:
         st.warning("Data not found.")
 
+    # Structured filters pushed down into the vector search (RAG only)
+    rag_filters = {}
+    if query_method != "Text2SQL (Structured Query)" and summary is not None:
+        values = summary["values"]
+        st.markdown("---")
+        st.markdown("### Filters")
+        rag_filters["claim_status"] = st.multiselect("Claim Status", values.get("claim_status", [])) or None
+        rag_filters["specialty"] = st.multiselect("Specialty", values.get("specialty", [])) or None
+        rag_filters["source"] = st.multiselect("Source", values.get("source", [])) or None
+        service_dates = summary["ranges"].get("service_date")
+        if service_dates and service_dates[0] is not None and st.checkbox("Filter by service date"):
+            date_range = st.date_input("Service date range", service_dates)
+            if len(date_range) == 2:
+                rag_filters["service_date_from"], rag_filters["service_date_to"] = date_range
+
+    show_debug = st.checkbox("Show debug metrics", help="Per-stage timings, token counts and cache hits")
+
+    with st.expander("Performance"):
+        perf_placeholder = st.empty()
+
 # Chat Interface
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # Display Chat History
-for message in st.session_state.messages:
+for i, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
-        if "dataframe" in message:
-            st.dataframe(message["dataframe"])
+        if message.get("result") is not None:
+            render_result(message["result"], key=f"page_{i}")
         if "sql" in message:
             st.code(message["sql"], language="sql")
 
+# Per-rerun overhead: everything before the question is handled
+rerun_s = time.perf_counter() - run_started
+perf_placeholder.caption("Rerun overhead: {:.0f} ms\n\nResource load times (first use):\n\n{}".format(
+    rerun_s * 1000, "\n\n".join(f"- {name}: {secs:.2f}s" for name, secs in RESOURCES.stats().items()) or "- none yet"))
+
 # User Input
 if prompt := st.chat_input("Ask a question (e.g., 'Show me denied claims for diabetes')"):
     # Add user message
@@ -76,52 +161,105 @@ if prompt := st.chat_input("Ask a question (e.g., 'Show me denied claims for dia
         st.markdown(prompt)
 
     # Generate Response
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                if query_method == "Text2SQL (Structured Query)":
-                    # Text2SQL Flow
-                    sql_query = t2s.generate_sql(prompt)
-                    st.markdown(f"**Generated SQL:**")
-                    st.code(sql_query, language="sql")
-                    
-                    results_df = t2s.execute_sql(sql_query)
-                    
-                    if 'error' in results_df.columns:
-                        st.error(f"SQL Execution Error: {results_df['error'].iloc[0]}")
-                        response_text = "Failed to execute query."
-                    elif not results_df.empty:
-                        st.dataframe(results_df)
-                        response_text = f"Found {len(results_df)} records."
+    with METRICS.trace() as trace, st.chat_message("assistant"):
+        try:
+            started = time.perf_counter()
+            if query_method == "Auto":
+                route, scores = router.classify(prompt)
+                st.caption(f"Routed to {'RAG + Text2SQL' if route == 'both' else route.upper()} "
+                           f"(rag {scores['rag']:.2f}, sql {scores['sql']:.2f})")
+            else:
+                route, scores = ("sql" if query_method == "Text2SQL (Structured Query)" else "rag"), {}
+            classify_s = time.perf_counter() - started
+
+            if route == "sql":
+                # Text2SQL Flow: stream the SQL as it is generated
+                st.markdown(f"**Generated SQL:**")
+                sql_placeholder = st.empty()
+                sql_metrics = {}
+                streamed = ""
+                for token in t2s.generate_sql_stream(prompt, metrics=sql_metrics):
+                    streamed += token
+                    sql_placeholder.code(streamed, language="sql")
+                # Completed response is cached, so this only parses it
+                sql_query = t2s.generate_sql(prompt)
+                sql_placeholder.code(sql_query, language="sql")
+            
+                # Validated, time-limited and streamed; only the visible page is fetched. Earlier
+                # answers release their cursors (they reopen only if another page is requested)
+                for message in st.session_state.messages:
+                    if message.get("result") is not None:
+                        message["result"].close()
+                result = None
+                try:
+                    with st.spinner("Running query..."):
+                        result = t2s.open_result(sql_query)
+                        total = result.total_rows()
+                except Exception as e:
+                    st.error(f"SQL Execution Error: {e}")
+                    response_text = "Failed to execute query."
+                else:
+                    if total:
+                        response_text = f"Found {total} records."
                     else:
                         response_text = "No results found."
-                        
-                    st.markdown(response_text)
-                    
-                    # Save to history
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response_text,
-                        "sql": sql_query,
-                        "dataframe": results_df if not results_df.empty else None
-                    })
-                    
-                else:
-                    # RAG Flow
-                    retrieval_results = rag.query(prompt)
-                    answer = rag.generate_answer(prompt, retrieval_results)
-                    
-                    st.markdown(answer)
-                    
-                    with st.expander("View Source Documents"):
-                        for doc in retrieval_results['documents'][0]:
-                            st.markdown(f"- {doc}")
-                            
-                    # Save to history
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": answer
-                    })
+                        result = None
+
+                st.markdown(response_text)
+                if result is not None:
+                    render_result(result, key=f"page_{len(st.session_state.messages)}")
+                st.caption(f"SQL generation: first token {sql_metrics.get('ttft_s', 0):.2f}s, "
+                           f"total {sql_metrics.get('total_s', 0):.2f}s")
+            
+                # Save to history
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response_text,
+                    "sql": sql_query,
+                    "result": result
+                })
+                router.record(prompt, route, scores, time.perf_counter() - started, classify_s)
+
+            elif route == "rag":
+                # RAG Flow: retrieve, then render the answer as tokens arrive
+                with st.spinner("Searching claims..."):
+                    retrieval_results = rag.query(prompt, filters=rag_filters)
+                answer_metrics = {}
+                answer = st.write_stream(rag.generate_answer_stream(prompt, retrieval_results, metrics=answer_metrics))
+                st.caption(f"Answer: first token {answer_metrics.get('ttft_s', 0):.2f}s, "
+                           f"total {answer_metrics.get('total_s', 0):.2f}s, prompt ~{rag.last_prompt_tokens} tokens")
+            
+                with st.expander("View Source Documents"):
+                    for doc in retrieval_results['documents'][0]:
+                        st.markdown(f"- {doc}")
                     
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
+                # Save to history
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer
+                })
+                router.record(prompt, route, scores, time.perf_counter() - started, classify_s)
+
+            else:
+                # Ambiguous: run both pipelines concurrently and show whatever succeeded
+                with st.spinner("Searching claims and running SQL..."):
+                    response = router.answer(prompt, route="both", filters=rag_filters)
+                message = {"role": "assistant", "content": response.get("answer") or ""}
+                if "answer" in response:
+                    st.markdown(response["answer"])
+                if "sql" in response:
+                    message["content"] += f"\n\nFound {len(response['result'])} records."
+                    st.markdown(f"Found {len(response['result'])} records.")
+                    st.dataframe(response["result"])
+                    st.code(response["sql"], language="sql")
+                    message["sql"] = response["sql"]
+                for name, error in response["errors"].items():
+                    st.warning(f"{name.upper()} failed: {error}")
+                st.caption(f"Answered in {response['latency_s']:.2f}s")
+                st.session_state.messages.append(message)
+            
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
+    if show_debug:
+        render_debug(trace)
@@ -0,0 +1,54 @@
+"""
+Offline throughput test of the async question path against the fake LLM server.
+
+Sends N distinct questions through Text2SQLPipeline.agenerate_sql concurrently
+and compares wall time with the sequential (blocking) cost of N round trips.
+
+Usage:
+    python -m benchmarks.bench_async_llm --requests 200 --concurrency 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_llm_server import start_server
+from src.llm import AsyncChatClient, StubLLMClient
+from src.text2sql_pipeline import Text2SQLPipeline
+
+
+async def run(t2s: Text2SQLPipeline, requests: int):
+    questions = [f"How many claims were denied in batch {i}?" for i in range(requests)]
+    start = time.perf_counter()
+    await asyncio.gather(*(t2s.agenerate_sql(q) for q in questions))
+    elapsed = time.perf_counter() - start
+    await t2s.llm.async_client.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gold", default="data/gold/claims_master.csv")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    t2s = Text2SQLPipeline(
+        llm=StubLLMClient(),
+        async_llm=AsyncChatClient(api_key="fake", base_url=base_url, max_concurrency=args.concurrency)
+    )
+    t2s.load_data(args.gold)
+
+    elapsed = asyncio.run(run(t2s, args.requests))
+    server.shutdown()
+
+    sequential = args.requests * args.latency
+    print(f"\n {args.requests} requests, concurrency {args.concurrency}, {args.latency}s LLM latency")
+    print(f" Wall time: {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f" Sequential estimate: {sequential:.1f}s ({sequential / elapsed:.1f}x speedup)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+End-to-end benchmark of the ETL, indexing, retrieval and SQL paths, offline.
+
+Generates a synthetic bronze dataset, runs the full ETL into a temporary
+directory, indexes a sample of gold into a fresh vector store and times RAG
+queries (with StubLLMClient answers) and a fixed set of SQL templates on the
+warehouse. Metrics are written to JSON and compared with a stored baseline;
+any metric worse than the baseline by more than --tolerance is flagged and the
+exit status is 1.
+
+Usage:
+    python -m benchmarks.bench_e2e --rows 1000000 --index-rows 20000
+    python -m benchmarks.bench_e2e --update-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from generate_insurance_data import DENIAL_REASONS, DIAGNOSES, PAYER_CONFIG_DIR, SPECIALTIES, generate
+from src.etl import load_payer_registry, run_etl
+from src.llm import StubLLMClient
+from src.rag_pipeline import RAGPipeline
+from src.text2sql_pipeline import Text2SQLPipeline
+
+RESULTS_DIR = "benchmarks/results"
+
+SQL_TEMPLATES = {
+    "count_by_status": "SELECT claim_status, COUNT(*) AS total_claims FROM claims GROUP BY claim_status",
+    "amount_by_specialty_month": (
+        "SELECT specialty, date_trunc('month', service_date) AS month, SUM(claim_amount) AS total_amount "
+        "FROM claims GROUP BY ALL ORDER BY month"
+    ),
+    "denial_rate_by_diagnosis": (
+        "SELECT diagnosis, AVG(CASE WHEN claim_status = 'Denied' THEN 1 ELSE 0 END) AS denial_rate "
+        "FROM claims GROUP BY diagnosis ORDER BY denial_rate DESC"
+    ),
+    "filtered_rows": (
+        "SELECT * FROM claims WHERE claim_status ILIKE 'Denied' AND specialty = 'Cardiology' "
+        "AND service_date BETWEEN DATE '2024-03-01' AND DATE '2024-05-31'"
+    ),
+    "top_patients": (
+        "SELECT patient_id, COUNT(*) AS claims, SUM(claim_amount) AS total_amount "
+        "FROM claims GROUP BY patient_id ORDER BY total_amount DESC LIMIT 20"
+    ),
+}
+
+
+def questions(n: int):
+    """Distinct natural-language questions, so each one misses the retrieval cache."""
+    templates = [
+        "Why were claims for {diagnosis} denied?",
+        "Show claims in {specialty} denied for {reason}",
+        "What treatments did patients with {diagnosis} receive in {specialty}?",
+    ]
+    out = []
+    for i in range(n):
+        template = templates[i % len(templates)]
+        out.append(template.format(diagnosis=DIAGNOSES[i % len(DIAGNOSES)],
+                                   specialty=SPECIALTIES[(i // 3) % len(SPECIALTIES)],
+                                   reason=DENIAL_REASONS[(i // 7) % len(DENIAL_REASONS)]) + f" (#{i})")
+    return out
+
+
+def percentiles(seconds, prefix: str):
+    ms = np.array(seconds) * 1000
+    return {f"{prefix}_p{p}_ms": float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS; children cover the worker pools
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale / 1e6
+
+
+def run(args, tmp: str):
+    metrics = {}
+
+    bronze_dir = os.path.join(tmp, "bronze")
+    # Work on a copy of the payer configs: generate() prunes generated configs above `payers`
+    config_dir = os.path.join(tmp, "payers")
+    shutil.copytree(PAYER_CONFIG_DIR, config_dir)
+    start = time.perf_counter()
+    generate(args.rows, payers=2, workers=args.workers, out_dir=bronze_dir, seed=args.seed, config_dir=config_dir)
+    metrics["generate_rows_per_sec"] = args.rows / (time.perf_counter() - start)
+
+    gold_path = os.path.join(tmp, "gold.csv")
+    warehouse_path = os.path.join(tmp, "warehouse.duckdb")
+    start = time.perf_counter()
+    total = run_etl(bronze_dir, os.path.join(tmp, "silver.csv"), gold_path,
+                    os.path.join(tmp, "silver_parquet"), os.path.join(tmp, "gold_parquet"),
+                    workers=args.workers, state_path=os.path.join(tmp, "etl_state.json"),
+                    registry=load_payer_registry(config_dir), warehouse_path=warehouse_path)
+    metrics["etl_rows_per_sec"] = total / (time.perf_counter() - start)
+
+    sample_path = os.path.join(tmp, "gold_sample.csv")
+    pd.read_csv(gold_path, nrows=args.index_rows).to_csv(sample_path, index=False)
+    rag = RAGPipeline(collection_name="bench_e2e", persist_dir=os.path.join(tmp, "index"),
+                      llm=StubLLMClient(), backend=args.backend)
+    stats = rag.ingest(sample_path, batch_size=args.batch_size, workers=args.embed_workers)
+    metrics["embed_docs_per_sec"] = stats["docs_per_sec"]
+
+    retrieval, answer = [], []
+    for question in questions(args.queries):
+        start = time.perf_counter()
+        results = rag.query(question)
+        retrieval.append(time.perf_counter() - start)
+        rag.generate_answer(question, results)
+        answer.append(time.perf_counter() - start)
+    metrics.update(percentiles(retrieval, "rag_query"))
+    metrics.update(percentiles(answer, "rag_answer"))
+
+    t2s = Text2SQLPipeline(db_path=warehouse_path, llm=StubLLMClient())
+    t2s.load_data(gold_path)
+    for name, sql in SQL_TEMPLATES.items():
+        latencies = []
+        for _ in range(args.sql_repeats):
+            # Time execution, not the result cache
+            t2s.result_cache.clear()
+            latencies.append(timed(t2s.execute_sql, sql))
+        metrics.update(percentiles(latencies, f"sql_{name}"))
+
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def compare(metrics, baseline, tolerance: float):
+    """Metrics worse than the baseline by more than `tolerance` (throughput down, latency/memory up)."""
+    regressions = []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = (value - base) / base
+        worse = -change if name.endswith("_per_sec") else change
+        if worse > tolerance:
+            regressions.append((name, base, value, worse))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000, help="Synthetic claims generated and run through the ETL")
+    parser.add_argument("--index-rows", type=int, default=10_000, help="Gold rows embedded and indexed")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--sql-repeats", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--embed-workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--backend", default="numpy", choices=["chroma", "numpy"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = run(args, tmp)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "update_baseline")},
+        "metrics": metrics,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'metric':>40} {'value':>12}")
+    for name, value in metrics.items():
+        print(f"{name:>40} {value:>12,.2f}")
+    print(f"\n Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f" Baseline updated: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(" No baseline to compare against (run with --update-baseline to store one)")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("params") != report["params"]:
+        print(" Warning: baseline was recorded with different parameters")
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    if not regressions:
+        print(f" No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        return
+    print(f"\n Regressions beyond {args.tolerance:.0%}:")
+    for name, base, value, worse in regressions:
+        print(f"   {name}: {base:,.2f} -> {value:,.2f} ({worse:+.0%} worse)")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
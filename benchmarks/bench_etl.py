@@ -0,0 +1,60 @@
+"""
+Benchmark text_representation construction: the original row-wise apply vs
+the vectorized build_text_representation, at several dataset sizes.
+
+Usage:
+    python -m benchmarks.bench_etl --sizes 10000 1000000 10000000 --legacy-max 1000000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from src.etl import SILVER_PATH, build_text_representation
+
+
+def legacy_create_text(row):
+    text = f"Claim {row['claim_id']}: Patient {row['patient_name']} (ID: {row['patient_id']}) received {row['procedure']} for {row['diagnosis']} on {row['service_date']}. "
+    text += f"Amount: ${row['claim_amount']}. Status: {row['claim_status']}."
+    if row['claim_status'] == 'Denied':
+        text += f" Denial Reason: {row['denial_reason']}."
+    text += f" Specialty: {row['specialty']}."
+    return text
+
+
+def synthetic_silver(base: pd.DataFrame, rows: int) -> pd.DataFrame:
+    df = base.sample(n=rows, replace=True, random_state=0).reset_index(drop=True)
+    df['claim_id'] = df['claim_id'] + "-" + df.index.astype(str)
+    return df
+
+
+def rows_per_sec(fn, df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    fn(df)
+    return len(df) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--silver", default=SILVER_PATH)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000,
+                        help="Skip the row-wise implementation above this many rows")
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.silver)
+    base['denial_reason'] = base['denial_reason'].fillna('')
+
+    print(f"{'rows':>12} {'apply rows/s':>14} {'vectorized rows/s':>18} {'speedup':>8}")
+    for size in args.sizes:
+        df = synthetic_silver(base, size)
+        vectorized = rows_per_sec(build_text_representation, df)
+        if size <= args.legacy_max:
+            legacy = rows_per_sec(lambda d: d.apply(legacy_create_text, axis=1), df)
+            print(f"{size:>12,} {legacy:>14,.0f} {vectorized:>18,.0f} {vectorized / legacy:>7.1f}x")
+        else:
+            print(f"{size:>12,} {'skipped':>14} {vectorized:>18,.0f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
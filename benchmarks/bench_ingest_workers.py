@@ -0,0 +1,54 @@
+"""
+Benchmark embedding throughput of RAGPipeline.ingest against worker count.
+
+Builds a synthetic gold CSV by replicating data/gold/claims_master.csv with
+unique claim ids, then runs a full (cold) ingest into a fresh temporary index
+for each worker count and prints docs/sec.
+
+Usage:
+    python -m benchmarks.bench_ingest_workers --rows 100000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from src.rag_pipeline import RAGPipeline
+
+
+def build_dataset(gold_path: str, rows: int, out_path: str):
+    base = pd.read_csv(gold_path)
+    reps = -(-rows // len(base))
+    df = pd.concat([base] * reps, ignore_index=True).head(rows)
+    suffix = (df.index // len(base)).astype(str)
+    df['claim_id'] = df['claim_id'].astype(str) + "-" + suffix
+    df['text_representation'] = df['text_representation'] + " Batch " + suffix + "."
+    df.to_csv(out_path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gold", default="data/gold/claims_master.csv")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=4000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "gold.csv")
+        build_dataset(args.gold, args.rows, csv_path)
+
+        results = []
+        for workers in args.workers:
+            rag = RAGPipeline(collection_name=f"bench_w{workers}", persist_dir=os.path.join(tmp, f"index_w{workers}"))
+            stats = rag.ingest(csv_path, batch_size=args.batch_size, workers=workers)
+            results.append((workers, stats["docs_per_sec"]))
+
+        print(f"\n{'workers':>8} {'docs/sec':>10} {'speedup':>8}")
+        for workers, dps in results:
+            print(f"{workers:>8} {dps:>10.1f} {dps / results[0][1]:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Latency/quality trade-off of the RAG retrieval stage: plain top-k vs
+over-fetch + MMR vs over-fetch + cross-encoder.
+
+Indexes a gold sample once, then asks templated questions whose expected
+diagnosis (and, for denial questions, status) is known. Quality is precision@k
+against those labels plus redundancy (mean pairwise cosine of the returned
+claims, lower is more diverse); cost is retrieval latency and the estimated
+tokens of the compact context that would be sent to the LLM.
+
+Usage:
+    python -m benchmarks.bench_rerank --rows 20000 --queries 100 --k 5 --fetch-k 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_insurance_data import DIAGNOSES
+from src.llm import StubLLMClient, estimate_tokens
+from src.rag_pipeline import RAGPipeline
+from src.rerank import normalize
+
+TEMPLATES = [
+    ("Why were claims for {diagnosis} denied?", "Denied"),
+    ("Show denied {diagnosis} claims", "Denied"),
+    ("What procedures do patients with {diagnosis} receive?", None),
+]
+
+
+def labeled_questions(n: int):
+    """(question, expected diagnosis, expected status or None)."""
+    questions = []
+    for i in range(n):
+        template, status = TEMPLATES[i % len(TEMPLATES)]
+        diagnosis = DIAGNOSES[(i // len(TEMPLATES)) % len(DIAGNOSES)]
+        questions.append((template.format(diagnosis=diagnosis), diagnosis, status))
+    return questions
+
+
+def evaluate(rag: RAGPipeline, questions, k: int):
+    latencies, precision, redundancy, tokens = [], [], [], []
+    for question, diagnosis, status in questions:
+        rag.retrieval_cache.clear()
+        start = time.perf_counter()
+        result = rag.query(question, n_results=k)
+        latencies.append(time.perf_counter() - start)
+
+        metadatas = result["metadatas"][0]
+        relevant = [m.get("diagnosis") == diagnosis and (status is None or m.get("claim_status") == status)
+                    for m in metadatas]
+        precision.append(sum(relevant) / k)
+        documents = result["documents"][0]
+        tokens.append(estimate_tokens(rag._compact_context(documents, metadatas)))
+        if len(documents) > 1:
+            vectors = normalize(rag.model.encode(documents))
+            sims = vectors @ vectors.T
+            redundancy.append(sims[np.triu_indices(len(documents), 1)].mean())
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": np.percentile(ms, 50),
+        "p95_ms": np.percentile(ms, 95),
+        f"precision@{k}": np.mean(precision),
+        "redundancy": np.mean(redundancy) if redundancy else float("nan"),
+        "context_tokens": np.mean(tokens),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gold", default="data/gold/claims_master.csv")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--backend", default="numpy", choices=["chroma", "numpy"])
+    parser.add_argument("--skip-cross-encoder", action="store_true")
+    args = parser.parse_args()
+
+    configs = {"top-k": None, "mmr": "mmr", "cross-encoder": "cross-encoder"}
+    if args.skip_cross_encoder:
+        del configs["cross-encoder"]
+    questions = labeled_questions(args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "gold.csv")
+        pd.read_csv(args.gold, nrows=args.rows).to_csv(sample, index=False)
+        rag = RAGPipeline(collection_name="bench_rerank", persist_dir=os.path.join(tmp, "index"),
+                          llm=StubLLMClient(), backend=args.backend, fetch_k=args.fetch_k)
+        rag.ingest(sample)
+
+        # Embed every question up front so each configuration times retrieval only
+        rag._embed_queries([question for question, _, _ in questions])
+        rows = {}
+        for name, rerank in configs.items():
+            rag.rerank = rerank
+            rag.query(questions[0][0], n_results=args.k)  # loads the cross-encoder if needed
+            rows[name] = evaluate(rag, questions, args.k)
+
+    print(pd.DataFrame(rows).T.round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Recall-vs-latency benchmark of the vector store backends.
+
+Generates clustered synthetic embeddings (MiniLM-sized, 384 dims), indexes them
+into Chroma and into the NumPy store at each quantization level, and reports
+recall@k against exact float32 brute force plus per-query latency.
+
+Usage:
+    python -m benchmarks.bench_vector_backends --rows 100000 --queries 200 --k 10
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from src.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+def synthetic_embeddings(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    data = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.normal(size=(rows, dim))
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data.astype(np.float32)
+
+
+def build(store, embeddings: np.ndarray, batch_size: int = 5000):
+    for start in range(0, len(embeddings), batch_size):
+        stop = min(start + batch_size, len(embeddings))
+        ids = [str(i) for i in range(start, stop)]
+        store.upsert(ids=ids, embeddings=embeddings[start:stop].tolist(),
+                     documents=ids, metadatas=[{"row": i} for i in range(start, stop)])
+    store.flush()
+
+
+def evaluate(store, queries: np.ndarray, truth: np.ndarray, k: int):
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(map(int, result["ids"][0])) & set(expected.tolist()))
+    latencies = np.array(latencies) * 1000
+    return hits / truth.size, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    embeddings = synthetic_embeddings(args.rows, args.dim, clusters=200)
+    queries = synthetic_embeddings(args.queries, args.dim, clusters=200, seed=1)
+    truth = np.argsort(-(queries @ embeddings.T), axis=1)[:, :args.k]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "chroma": ChromaVectorStore(tmp, "bench"),
+            "numpy-float32": NumpyVectorStore(tmp, "f32"),
+            "numpy-float16": NumpyVectorStore(tmp, "f16", quantization="float16"),
+            "numpy-int8": NumpyVectorStore(tmp, "i8", quantization="int8"),
+        }
+        print(f"{'backend':>14} {'build s':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'MB':>8}")
+        for name, store in stores.items():
+            start = time.perf_counter()
+            build(store, embeddings)
+            build_s = time.perf_counter() - start
+            recall, p50, p95 = evaluate(store, queries, truth, args.k)
+            size_mb = store.vectors.nbytes / 1e6 if hasattr(store, "vectors") else float("nan")
+            print(f"{name:>14} {build_s:>8.1f} {recall:>10.3f} {p50:>8.2f} {p95:>8.2f} {size_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Local fake of an OpenAI-compatible chat completions endpoint for offline load tests.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8001 --latency 0.5
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 streamlit run app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SQL_RESPONSE = "SELECT claim_status, COUNT(*) AS total_claims FROM claims GROUP BY claim_status"
+ANSWER_RESPONSE = "Most denied claims in the provided context were rejected for missing prior authorization."
+
+
+def make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            time.sleep(latency)
+            content = SQL_RESPONSE if "SQL" in body["messages"][0]["content"] else ANSWER_RESPONSE
+            payload = json.dumps({
+                "id": "fake-completion",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.5) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency))
+    print(f" Fake LLM server on http://{args.host}:{args.port}/v1 (latency {args.latency}s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,30 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import random
+"""
+Synthetic bronze claims for the ETL, indexing and SQL paths, including load
+tests at 10M+ rows.
+
+Rows are generated with vectorized NumPy draws and written straight to
+data/bronze as CSV or Parquet shards. Shards run in parallel across processes,
+each seeded from (seed, payer, shard), so the output does not depend on the
+number of workers.
+
+Usage:
+    python generate_insurance_data.py
+    python generate_insurance_data.py --rows 10000000 --payers 6 --skew 1.0 --format parquet
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Set random seed for reproducibility
-np.random.seed(42)
-random.seed(42)
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 # Realistic data pools based on actual insurance standards
 DIAGNOSES = [
@@ -99,204 +118,260 @@ LAST_NAMES = [
     'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris'
 ]
 
-def generate_date(start_date, end_date):
-    """Generate random date between start and end"""
-    delta = end_date - start_date
-    random_days = random.randint(0, delta.days)
-    return start_date + timedelta(days=random_days)
+# Claim amount range (inclusive) per procedure family, matched against the procedure name
+AMOUNT_RANGES = {
+    'Office Visit': (100, 300),
+    'Lab': (50, 250),
+    'X-Ray': (200, 500),
+    'CT Scan': (800, 1500),
+    'MRI': (1200, 2500),
+    'EKG': (150, 300),
+    'Echocardiogram': (500, 1000),
+    'Physical Therapy': (100, 200),
+    'Emergency Room': (1000, 3000),
+    'Colonoscopy': (1500, 3000),
+    'Ultrasound': (300, 600),
+    'Prescription': (50, 500)
+}
+DEFAULT_AMOUNT_RANGE = (100, 500)
+
+DENIAL_RATE = 0.30
+START_DATE = '2024-01-01'
+END_DATE = '2024-12-31'
+
+BRONZE_DIR = 'data/bronze'
+PAYER_CONFIG_DIR = 'config/payers'
+
+# Claim id prefixes of the two original payers; further payers get PY<n>-
+CLAIM_PREFIXES = {1: 'BC', 2: 'AET-'}
+
+PROCEDURE_NAMES = np.array(list(PROCEDURES), dtype=object)
+PROCEDURE_CODES = np.array(list(PROCEDURES.values()), dtype=object)
+
+
+def _amount_bounds():
+    # Resolved once per procedure instead of scanning the ranges for every row
+    bounds = []
+    for name in PROCEDURE_NAMES:
+        for key, bound in AMOUNT_RANGES.items():
+            if key.lower() in name.lower():
+                bounds.append(bound)
+                break
+        else:
+            bounds.append(DEFAULT_AMOUNT_RANGE)
+    return np.array(bounds).T
 
-def generate_insurance_1_data(n_records=2500):
+
+AMOUNT_LOW, AMOUNT_HIGH = _amount_bounds()
+
+
+def _service_dates(fmt):
+    return np.array(pd.date_range(START_DATE, END_DATE, freq='D').strftime(fmt), dtype=object)
+
+
+def _pick(rng, values, n):
+    values = np.asarray(values, dtype=object)
+    return values[rng.integers(len(values), size=n)]
+
+
+def _prefixed(prefix, numbers, width=0):
+    numbers = pd.Series(numbers).astype(str)
+    if width:
+        numbers = numbers.str.zfill(width)
+    return (prefix + numbers).to_numpy(dtype=object)
+
+
+def _draw_claims(rng, n, name_format, date_format):
+    """Columns shared by every payer style, drawn for `n` claims at once."""
+    first = _pick(rng, FIRST_NAMES, n)
+    last = _pick(rng, LAST_NAMES, n)
+    procedure = rng.integers(len(PROCEDURE_NAMES), size=n)
+    denied = rng.random(n) < DENIAL_RATE
+    if name_format == 'first_last':
+        names = pd.Series(first).str.cat(pd.Series(last), sep=' ')
+    else:
+        names = pd.Series(last).str.cat(pd.Series(first), sep=', ')
+    return {
+        'patient_name': names.to_numpy(dtype=object),
+        'diagnosis': _pick(rng, DIAGNOSES, n),
+        'procedure_name': PROCEDURE_NAMES[procedure],
+        'procedure_code': PROCEDURE_CODES[procedure],
+        'claim_amount': rng.integers(AMOUNT_LOW[procedure], AMOUNT_HIGH[procedure] + 1),
+        'denied': denied,
+        'denial_reason': np.where(denied, _pick(rng, DENIAL_REASONS, n), None),
+        'service_date': _pick(rng, _service_dates(date_format), n),
+        'specialty': _pick(rng, SPECIALTIES, n),
+    }
+
+
+def generate_insurance_1_data(n_records=2500, seed=42, start=0, claim_prefix='BC'):
     """
     Generate data for Insurance Company 1 (e.g., BlueCross BlueShield)
     Schema: More detailed, includes ICD codes
     """
-    data = []
-    
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    
-    for i in range(n_records):
-        claim_id = f"BC{str(i+10001).zfill(6)}"
-        patient_id = f"P{str(random.randint(1000, 9999))}"
-        patient_name = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
-        
-        diagnosis = random.choice(DIAGNOSES)
-        icd_code = ICD10_CODES[diagnosis]
-        
-        procedure_name = random.choice(list(PROCEDURES.keys()))
-        procedure_code = PROCEDURES[procedure_name]
-        
-        # Claim amounts vary by procedure type
-        base_amount = {
-            'Office Visit': random.randint(100, 300),
-            'Lab': random.randint(50, 250),
-            'X-Ray': random.randint(200, 500),
-            'CT Scan': random.randint(800, 1500),
-            'MRI': random.randint(1200, 2500),
-            'EKG': random.randint(150, 300),
-            'Echocardiogram': random.randint(500, 1000),
-            'Physical Therapy': random.randint(100, 200),
-            'Emergency Room': random.randint(1000, 3000),
-            'Colonoscopy': random.randint(1500, 3000),
-            'Ultrasound': random.randint(300, 600),
-            'Prescription': random.randint(50, 500)
-        }
-        
-        # Determine amount based on procedure
-        for key in base_amount:
-            if key.lower() in procedure_name.lower():
-                claim_amount = base_amount[key]
-                break
-        else:
-            claim_amount = random.randint(100, 500)
-        
-        # 70% approved, 30% denied
-        claim_status = random.choices(['Approved', 'Denied'], weights=[0.70, 0.30])[0]
-        denial_reason = random.choice(DENIAL_REASONS) if claim_status == 'Denied' else ''
-        
-        service_date = generate_date(start_date, end_date)
-        provider_specialty = random.choice(SPECIALTIES)
-        
-        # Insurance 1 specific fields
-        member_number = f"MEM{random.randint(100000, 999999)}"
-        
-        data.append({
-            'claim_id': claim_id,
-            'patient_id': patient_id,
-            'member_number': member_number,
-            'patient_name': patient_name,
-            'diagnosis': diagnosis,
-            'icd_code': icd_code,
-            'procedure_name': procedure_name,
-            'procedure_code': procedure_code,
-            'claim_amount': claim_amount,
-            'claim_status': claim_status,
-            'denial_reason': denial_reason,
-            'service_date': service_date.strftime('%Y-%m-%d'),
-            'provider_specialty': provider_specialty
-        })
-    
-    return pd.DataFrame(data)
-
-def generate_insurance_2_data(n_records=2500):
+    rng = np.random.default_rng(seed)
+    claims = _draw_claims(rng, n_records, 'first_last', '%Y-%m-%d')
+    diagnosis = claims['diagnosis']
+    return pd.DataFrame({
+        'claim_id': _prefixed(claim_prefix, np.arange(start, start + n_records) + 10001, width=6),
+        'patient_id': _prefixed('P', rng.integers(1000, 10000, size=n_records)),
+        'member_number': _prefixed('MEM', rng.integers(100000, 1000000, size=n_records)),
+        'patient_name': claims['patient_name'],
+        'diagnosis': diagnosis,
+        'icd_code': pd.Series(diagnosis).map(ICD10_CODES).to_numpy(dtype=object),
+        'procedure_name': claims['procedure_name'],
+        'procedure_code': claims['procedure_code'],
+        'claim_amount': claims['claim_amount'],
+        'claim_status': np.where(claims['denied'], 'Denied', 'Approved'),
+        'denial_reason': np.where(claims['denied'], claims['denial_reason'], ''),
+        'service_date': claims['service_date'],
+        'provider_specialty': claims['specialty']
+    })
+
+
+def generate_insurance_2_data(n_records=2500, seed=42, start=0, claim_prefix='AET-'):
     """
     Generate data for Insurance Company 2 (e.g., Aetna)
     Schema: Different column names, no ICD codes, different date format
     """
-    data = []
-    
-    start_date = datetime(2024, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    
-    for i in range(n_records):
-        # Different claim ID format
-        claim_number = f"AET-{str(i+20001)}"
-        
-        # Different patient ID format
-        subscriber_id = f"SUB{random.randint(10000, 99999)}"
-        
-        # Different name format (Last, First)
-        first = random.choice(FIRST_NAMES)
-        last = random.choice(LAST_NAMES)
-        patient_full_name = f"{last}, {first}"
-        
-        diagnosis = random.choice(DIAGNOSES)
-        
-        procedure_name = random.choice(list(PROCEDURES.keys()))
-        cpt_code = PROCEDURES[procedure_name]  # Different column name
-        
-        # Similar amount logic
-        base_amount = {
-            'Office Visit': random.randint(100, 300),
-            'Lab': random.randint(50, 250),
-            'X-Ray': random.randint(200, 500),
-            'CT Scan': random.randint(800, 1500),
-            'MRI': random.randint(1200, 2500),
-            'EKG': random.randint(150, 300),
-            'Echocardiogram': random.randint(500, 1000),
-            'Physical Therapy': random.randint(100, 200),
-            'Emergency Room': random.randint(1000, 3000),
-            'Colonoscopy': random.randint(1500, 3000),
-            'Ultrasound': random.randint(300, 600),
-            'Prescription': random.randint(50, 500)
-        }
-        
-        for key in base_amount:
-            if key.lower() in procedure_name.lower():
-                billed_amount = base_amount[key]  # Different column name
-                break
-        else:
-            billed_amount = random.randint(100, 500)
-        
-        # Different status values
-        status = random.choices(['PAID', 'REJECTED'], weights=[0.70, 0.30])[0]
-        rejection_code = random.choice(DENIAL_REASONS) if status == 'REJECTED' else None
-        
-        date_of_service = generate_date(start_date, end_date)
-        specialty = random.choice(SPECIALTIES)
-        
-        data.append({
-            'claim_number': claim_number,
-            'subscriber_id': subscriber_id,
-            'patient_full_name': patient_full_name,
-            'diagnosis_description': diagnosis,  # Different column name
-            'cpt_code': cpt_code,  # Different column name
-            'procedure_description': procedure_name,
-            'billed_amount': billed_amount,  # Different column name
-            'status': status,  # Different values
-            'rejection_code': rejection_code,  # Different column name
-            'date_of_service': date_of_service.strftime('%m/%d/%Y'),  # Different format
-            'specialty': specialty
-        })
-    
-    return pd.DataFrame(data)
+    rng = np.random.default_rng(seed)
+    claims = _draw_claims(rng, n_records, 'last_first', '%m/%d/%Y')
+    return pd.DataFrame({
+        'claim_number': _prefixed(claim_prefix, np.arange(start, start + n_records) + 20001),
+        'subscriber_id': _prefixed('SUB', rng.integers(10000, 100000, size=n_records)),
+        'patient_full_name': claims['patient_name'],
+        'diagnosis_description': claims['diagnosis'],
+        'cpt_code': claims['procedure_code'],
+        'procedure_description': claims['procedure_name'],
+        'billed_amount': claims['claim_amount'],
+        'status': np.where(claims['denied'], 'REJECTED', 'PAID'),
+        'rejection_code': claims['denial_reason'],
+        'date_of_service': claims['service_date'],
+        'specialty': claims['specialty']
+    })
+
+
+# Odd payers use the Company 1 schema, even payers the Company 2 schema
+GENERATORS = {1: generate_insurance_1_data, 2: generate_insurance_2_data}
+
+
+def payer_style(payer):
+    return 1 if payer % 2 else 2
+
+
+def payer_row_counts(rows, payers, skew=0.0):
+    """Split `rows` across payers with Zipf-like weights 1/k^skew (0 = even split)."""
+    weights = 1.0 / np.arange(1, payers + 1) ** skew
+    counts = np.floor(rows * weights / weights.sum()).astype(int)
+    counts[0] += rows - counts.sum()
+    return counts.tolist()
+
+
+def plan_shards(rows, payers, skew=0.0, shard_rows=1_000_000):
+    """(payer, shard, n_shards, start, n_records) for every output file."""
+    shards = []
+    for payer, count in enumerate(payer_row_counts(rows, payers, skew), start=1):
+        n_shards = math.ceil(count / shard_rows)
+        for shard in range(n_shards):
+            start = shard * shard_rows
+            shards.append((payer, shard, n_shards, start, min(shard_rows, count - start)))
+    return shards
+
+
+def shard_path(out_dir, payer, shard, n_shards, fmt):
+    suffix = f"_part{shard:05d}" if n_shards > 1 else ""
+    return os.path.join(out_dir, f"insurance_company_{payer}_claims{suffix}.{fmt}")
+
+
+def write_shard(payer, shard, n_shards, start, n_records, seed, out_dir, fmt):
+    # Runs in a worker process; the seed depends only on (seed, payer, shard)
+    started = time.perf_counter()
+    generate = GENERATORS[payer_style(payer)]
+    df = generate(n_records, seed=[seed, payer, shard], start=start,
+                  claim_prefix=CLAIM_PREFIXES.get(payer, f"PY{payer}-"))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path = shard_path(out_dir, payer, shard, n_shards, fmt)
+    if fmt == 'parquet':
+        pq.write_table(table, path)
+    else:
+        pacsv.write_csv(table, path)
+    return path, n_records, time.perf_counter() - started
+
+
+def ensure_payer_configs(payers, config_dir=PAYER_CONFIG_DIR):
+    """
+    Register payers beyond the two shipped ones by cloning the matching schema's
+    config, and remove configs generated earlier for payers above `payers`.
+    """
+    for path in glob.glob(os.path.join(config_dir, "company_*.json")):
+        match = re.fullmatch(r"company_(\d+)\.json", os.path.basename(path))
+        if not match or int(match.group(1)) <= payers:
+            continue
+        with open(path) as f:
+            if json.load(f).get("generated"):
+                os.remove(path)
+                print(f"   Removed payer config {path}")
+    for payer in range(3, payers + 1):
+        path = os.path.join(config_dir, f"company_{payer}.json")
+        if os.path.exists(path):
+            continue
+        with open(os.path.join(config_dir, f"company_{payer_style(payer)}.json")) as f:
+            config = json.load(f)
+        config.update(source=f"Company_{payer}", file_pattern=f"insurance_company_{payer}_claims*", generated=True)
+        with open(path, 'w') as f:
+            json.dump(config, f, indent=2)
+        print(f"   Registered payer config {path}")
+
+
+def generate(rows=5000, payers=2, skew=0.0, shard_rows=1_000_000, workers=1, fmt='csv',
+             out_dir=BRONZE_DIR, seed=42, config_dir=PAYER_CONFIG_DIR):
+    """Write `rows` claims across `payers` into `out_dir`; returns (path, rows) per file."""
+    os.makedirs(out_dir, exist_ok=True)
+    ensure_payer_configs(payers, config_dir)
+    shards = plan_shards(rows, payers, skew, shard_rows)
+    # Replace all earlier output, including payers dropped since the last run, so the ETL
+    # does not pick up stale shards
+    for stale in glob.glob(os.path.join(out_dir, "insurance_company_*_claims*")):
+        os.remove(stale)
+
+    started = time.perf_counter()
+    jobs = [(*shard, seed, out_dir, fmt) for shard in shards]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(write_shard, *zip(*jobs)))
+    else:
+        results = [write_shard(*job) for job in jobs]
+    elapsed = time.perf_counter() - started
+
+    for path, n_records, seconds in results:
+        print(f"   • {path} ({n_records:,} records, {n_records / seconds:,.0f} rows/sec)")
+    print(f"\n⏱️  {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/sec, "
+          f"{len(results)} files, {min(workers, len(jobs))} workers)")
+    return [(path, n_records) for path, n_records, _ in results]
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic bronze claims data")
+    parser.add_argument("--rows", type=int, default=5000, help="Total claims across all payers")
+    parser.add_argument("--payers", type=int, default=2)
+    parser.add_argument("--skew", type=float, default=0.0,
+                        help="Zipf exponent for the payer size distribution (0 = equal sizes)")
+    parser.add_argument("--shard-rows", type=int, default=1_000_000, help="Rows per output file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default=BRONZE_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
     print("🏥 Generating Insurance Claims Data...")
     print("=" * 50)
-    
-    # Generate data for both insurance companies
-    print("\n📊 Generating Insurance Company 1 (BlueCross-style) data...")
-    df_insurance1 = generate_insurance_1_data(2500)
-    
-    print("📊 Generating Insurance Company 2 (Aetna-style) data...")
-    df_insurance2 = generate_insurance_2_data(2500)
-    
-    # Save to CSV
-    insurance1_file = 'insurance_company_1_claims.csv'
-    insurance2_file = 'insurance_company_2_claims.csv'
-    
-    df_insurance1.to_csv(insurance1_file, index=False)
-    df_insurance2.to_csv(insurance2_file, index=False)
-    
-    print("\n✅ Data generation complete!")
-    print("=" * 50)
-    print(f"\n📁 Files created:")
-    print(f"   • {insurance1_file} ({len(df_insurance1)} records)")
-    print(f"   • {insurance2_file} ({len(df_insurance2)} records)")
-    
+    generate(args.rows, args.payers, args.skew, args.shard_rows, args.workers, args.format, args.out, args.seed)
+
     print("\n📋 Schema Differences:")
     print("\nInsurance 1 columns:")
-    print(f"   {list(df_insurance1.columns)}")
+    print(f"   {list(generate_insurance_1_data(1).columns)}")
     print("\nInsurance 2 columns:")
-    print(f"   {list(df_insurance2.columns)}")
-    
-    print("\n📊 Sample Data Preview:")
-    print("\n--- Insurance Company 1 (First 2 rows) ---")
-    print(df_insurance1.head(2).to_string())
-    
-    print("\n--- Insurance Company 2 (First 2 rows) ---")
-    print(df_insurance2.head(2).to_string())
-    
-    print("\n📈 Statistics:")
-    print(f"\nInsurance 1:")
-    print(f"   Approved: {len(df_insurance1[df_insurance1['claim_status']=='Approved'])}")
-    print(f"   Denied: {len(df_insurance1[df_insurance1['claim_status']=='Denied'])}")
-    
-    print(f"\nInsurance 2:")
-    print(f"   PAID: {len(df_insurance2[df_insurance2['status']=='PAID'])}")
-    print(f"   REJECTED: {len(df_insurance2[df_insurance2['status']=='REJECTED'])}")
+    print(f"   {list(generate_insurance_2_data(1).columns)}")
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from src.metrics import METRICS
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional TTL and hit/miss counters.
+
+    With `maxbytes`, entries are also evicted until the total of
+    `sizeof(value)` fits; values larger than the budget are not stored.
+    A `name` also reports hits and misses to the metrics registry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 maxbytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None,
+                 name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    self._report("hit")
+                    return value
+                self._pop(key)
+            self.misses += 1
+            self._report("miss")
+            return default
+
+    def _report(self, result: str):
+        if self.name:
+            METRICS.inc("cache_requests_total", cache=self.name, result=result)
+
+    def _pop(self, key: Hashable):
+        self.nbytes -= self._data.pop(key)[2]
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._pop(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,94 +1,561 @@
 import pandas as pd
+import numpy as np
+import duckdb
+import argparse
+import glob
+import json
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+BRONZE_DIR = 'data/bronze'
+SILVER_PATH = 'data/silver/claims_normalized.csv'
+GOLD_PATH = 'data/gold/claims_master.csv'
+# Parquet datasets, partitioned by source/service_month
+SILVER_PARQUET = 'data/silver/claims_normalized'
+GOLD_PARQUET = 'data/gold/claims_master'
+# Manifest of processed bronze files + per-source watermarks for incremental runs
+STATE_PATH = 'data/etl_state.json'
+CHANGESET_DIR = 'data/changesets'
+# One JSON mapping per payer, see PayerSchema
+PAYER_CONFIG_DIR = 'config/payers'
+# Typed, persistent DuckDB copy of gold used by Text2SQL
+WAREHOUSE_PATH = 'data/warehouse.duckdb'
+
+GOLD_COLUMN_TYPES = {
+    'claim_id': 'VARCHAR', 'patient_id': 'VARCHAR', 'patient_name': 'VARCHAR', 'diagnosis': 'VARCHAR',
+    'procedure': 'VARCHAR', 'claim_amount': 'DECIMAL(12,2)', 'claim_status': 'VARCHAR', 'denial_reason': 'VARCHAR',
+    'service_date': 'DATE', 'specialty': 'VARCHAR', 'source': 'VARCHAR', 'text_representation': 'VARCHAR'
+}
+
+# Pre-aggregated summary of claims, refreshed with the warehouse; Text2SQL routes
+# aggregate queries that only touch these dimensions to it
+ROLLUP_TABLE = 'claims_rollup'
+ROLLUP_DIMENSIONS = ['claim_status', 'specialty', 'diagnosis', 'denial_reason', 'source', 'service_month']
+
+COMMON_COLUMNS = ['claim_id', 'patient_id', 'patient_name', 'diagnosis', 'procedure', 'claim_amount', 'claim_status', 'denial_reason', 'service_date', 'specialty', 'source']
+
+class PayerSchema:
+    """
+    Declarative bronze -> silver mapping for one payer, loaded from
+    config/payers/<payer>.json:
+
+    - source: value written to the `source` column
+    - file_pattern: glob for the payer's bronze files
+    - renames: payer column -> common column
+    - value_maps: common column -> {payer value: common value}
+    - date_formats: common column -> strptime format, re-emitted as YYYY-MM-DD
+    - dtypes: common column -> pandas dtype
+    """
+
+    def __init__(self, source, file_pattern, renames=None, value_maps=None, date_formats=None, dtypes=None, **_):
+        self.source = source
+        self.file_pattern = file_pattern
+        self.renames = renames or {}
+        self.value_maps = value_maps or {}
+        self.date_formats = date_formats or {}
+        self.dtypes = dtypes or {}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def normalize(self, df):
+        df = df.rename(columns=self.renames)
+        for col, mapping in self.value_maps.items():
+            df[col] = df[col].map(mapping)
+        # Standardize Date Format to YYYY-MM-DD
+        for col, fmt in self.date_formats.items():
+            df[col] = pd.to_datetime(df[col], format=fmt).dt.strftime('%Y-%m-%d')
+        for col, dtype in self.dtypes.items():
+            df[col] = df[col].astype(dtype)
+        df['source'] = self.source
+        return _conform(df)
+
+def load_payer_registry(config_dir=PAYER_CONFIG_DIR):
+    return [PayerSchema.from_file(path) for path in sorted(glob.glob(os.path.join(config_dir, '*.json')))]
+
+def _conform(df):
+    # Ensure all columns exist, in the common order
+    df = df.reindex(columns=COMMON_COLUMNS)
+    # Fill NA denial reasons with empty string
+    return df.assign(denial_reason=df['denial_reason'].fillna(''))
+
+def list_bronze_files(bronze_dir=BRONZE_DIR, registry=None):
+    """Yield (source, path, schema) for every bronze file, oldest first per payer."""
+    for schema in (registry if registry is not None else load_payer_registry()):
+        paths = sorted(glob.glob(os.path.join(bronze_dir, schema.file_pattern)), key=lambda p: (os.path.getmtime(p), p))
+        for path in paths:
+            yield schema.source, path, schema
+
+def build_text_representation(df):
+    """
+    Vectorized text_representation, e.g.
+    "Claim [ID]: Patient [Name] (ID: [ID]) received [Procedure] for [Diagnosis] on [Date]. Amount: $[Amount]. Status: [Status]. [Denial Reason: ...] Specialty: [Specialty]."
+    """
+    def col(name):
+        # Missing values render as 'nan', the same as the f-string they replace
+        return df[name].astype(str).fillna('nan')
+
+    text = ("Claim " + col('claim_id') + ": Patient " + col('patient_name') + " (ID: " + col('patient_id')
+            + ") received " + col('procedure') + " for " + col('diagnosis') + " on " + col('service_date')
+            + ". Amount: $" + col('claim_amount') + ". Status: " + col('claim_status') + ".")
+    denial = np.where(df['claim_status'] == 'Denied', " Denial Reason: " + col('denial_reason') + ".", "")
+    return text + denial + " Specialty: " + col('specialty') + "."
+
+def write_parquet(df, root):
+    # Partitioned by source and service month so readers can prune by payer/date
+    partitioned = df.assign(service_month=df['service_date'].astype(str).str[:7])
+    partitioned.to_parquet(root, partition_cols=['source', 'service_month'], index=False)
+
+def read_bronze(path, chunksize):
+    """Chunks of a bronze file: CSV, or Parquet read one record batch at a time."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+def iter_silver_chunks(bronze_dir=BRONZE_DIR, chunksize=100_000, files=None):
+    for source, path, schema in (files if files is not None else list_bronze_files(bronze_dir)):
+        for chunk in read_bronze(path, chunksize):
+            yield schema.normalize(chunk)
+
 def process_bronze_to_silver():
     print(" Processing Bronze to Silver...")
-    
-    # Load Bronze Data
-    df1 = pd.read_csv('data/bronze/insurance_company_1_claims.csv')
-    df2 = pd.read_csv('data/bronze/insurance_company_2_claims.csv')
-    
-    # Normalize Company 1
-    # Columns: claim_id, patient_id, member_number, patient_name, diagnosis, icd_code, procedure_name, procedure_code, claim_amount, claim_status, denial_reason, service_date, provider_specialty
-    df1_silver = df1.rename(columns={
-        'procedure_name': 'procedure',
-        'provider_specialty': 'specialty'
-    })
-    df1_silver['source'] = 'Company_1'
-    
-    # Normalize Company 2
-    # Columns: claim_number, subscriber_id, patient_full_name, diagnosis_description, cpt_code, procedure_description, billed_amount, status, rejection_code, date_of_service, specialty
-    df2_silver = df2.rename(columns={
-        'claim_number': 'claim_id',
-        'subscriber_id': 'patient_id',
-        'patient_full_name': 'patient_name',
-        'diagnosis_description': 'diagnosis',
-        'procedure_description': 'procedure',
-        'billed_amount': 'claim_amount',
-        'status': 'claim_status',
-        'rejection_code': 'denial_reason',
-        'date_of_service': 'service_date',
-        'cpt_code': 'procedure_code'
-    })
-    
-    # Standardize Values for Company 2
-    status_map = {'PAID': 'Approved', 'REJECTED': 'Denied'}
-    df2_silver['claim_status'] = df2_silver['claim_status'].map(status_map)
-    
-    # Standardize Date Format to YYYY-MM-DD
-    df2_silver['service_date'] = pd.to_datetime(df2_silver['service_date'], format='%m/%d/%Y').dt.strftime('%Y-%m-%d')
-    
-    df2_silver['source'] = 'Company_2'
-    
-    # Combine
-    common_columns = ['claim_id', 'patient_id', 'patient_name', 'diagnosis', 'procedure', 'claim_amount', 'claim_status', 'denial_reason', 'service_date', 'specialty', 'source']
-    
-    # Ensure all columns exist
-    for col in common_columns:
-        if col not in df1_silver.columns:
-            df1_silver[col] = None
-        if col not in df2_silver.columns:
-            df2_silver[col] = None
-            
-    df_silver = pd.concat([df1_silver[common_columns], df2_silver[common_columns]], ignore_index=True)
-    
-    # Fill NA denial reasons with empty string
-    df_silver['denial_reason'] = df_silver['denial_reason'].fillna('')
-    
+
+    df_silver = pd.concat(list(iter_silver_chunks()), ignore_index=True)
+
     # Save Silver
-    output_path = 'data/silver/claims_normalized.csv'
+    output_path = SILVER_PATH
     df_silver.to_csv(output_path, index=False)
     print(f" Silver data saved to {output_path} ({len(df_silver)} records)")
     return df_silver
 
 def process_silver_to_gold(df_silver):
     print("\n🔄 Processing Silver to Gold...")
-    
+
     df_gold = df_silver.copy()
-    
+
     # Create Text Representation for RAG
-    # "Claim [ID]: Patient [Name] (ID: [ID]) - [Procedure] for [Diagnosis]. Status: [Status]. Reason: [Reason]. Date: [Date]."
-    
-    def create_text(row):
-        text = f"Claim {row['claim_id']}: Patient {row['patient_name']} (ID: {row['patient_id']}) received {row['procedure']} for {row['diagnosis']} on {row['service_date']}. "
-        text += f"Amount: ${row['claim_amount']}. Status: {row['claim_status']}."
-        if row['claim_status'] == 'Denied':
-            text += f" Denial Reason: {row['denial_reason']}."
-        text += f" Specialty: {row['specialty']}."
-        return text
-
-    df_gold['text_representation'] = df_gold.apply(create_text, axis=1)
-    
+    df_gold['text_representation'] = build_text_representation(df_gold)
+
     # Save Gold
-    output_path = 'data/gold/claims_master.csv'
+    output_path = GOLD_PATH
     df_gold.to_csv(output_path, index=False)
     print(f" Gold data saved to {output_path}")
-    
+
     # Also save a sample for quick inspection
     print("\nSample Gold Data (Text Representation):")
     print(df_gold['text_representation'].head(2).values)
 
+def _process_bronze_file(index, path, schema, parts_dir, silver_parquet, gold_parquet, chunksize):
+    # Runs in a worker process: normalize one bronze file into numbered CSV parts
+    # (concatenated in order by the parent) and Parquet files in the shared datasets
+    start = time.perf_counter()
+    rows = 0
+    silver_part = os.path.join(parts_dir, f"{index:05d}_silver.csv")
+    gold_part = os.path.join(parts_dir, f"{index:05d}_gold.csv")
+    for i, chunk in enumerate(read_bronze(path, chunksize)):
+        df_silver = schema.normalize(chunk)
+        df_gold = df_silver.assign(text_representation=build_text_representation(df_silver))
+        mode = 'w' if i == 0 else 'a'
+        df_silver.to_csv(silver_part, mode=mode, header=False, index=False)
+        df_gold.to_csv(gold_part, mode=mode, header=False, index=False)
+        write_parquet(df_silver, silver_parquet)
+        write_parquet(df_gold, gold_parquet)
+        rows += len(df_silver)
+    return schema.source, rows, time.perf_counter() - start
+
+def _concat_parts(part_paths, output_path, columns):
+    with open(output_path, 'w', newline='') as out:
+        out.write(','.join(columns) + '\n')
+        for part in part_paths:
+            if os.path.exists(part):
+                with open(part) as f:
+                    shutil.copyfileobj(f, out)
+
+def run_etl(bronze_dir=BRONZE_DIR, silver_path=SILVER_PATH, gold_path=GOLD_PATH,
+            silver_parquet=SILVER_PARQUET, gold_parquet=GOLD_PARQUET, chunksize=100_000,
+            workers=1, state_path=STATE_PATH, registry=None, warehouse_path=WAREHOUSE_PATH):
+    """
+    Streamed Bronze -> Silver -> Gold. Each bronze chunk is normalized with its
+    payer's PayerSchema, given its text representation and appended to the CSV
+    and Parquet outputs, so memory stays bounded by `chunksize` regardless of
+    input size. Independent bronze files are normalized in parallel across
+    `workers` processes.
+    """
+    print(f" Running ETL in chunks of {chunksize} rows with {workers} workers...")
+    start = time.perf_counter()
+
+    for root in (silver_parquet, gold_parquet):
+        if os.path.exists(root):
+            shutil.rmtree(root)
+
+    files = list(list_bronze_files(bronze_dir, registry))
+    per_payer = {}
+    with tempfile.TemporaryDirectory() as parts_dir:
+        jobs = [(i, path, schema, parts_dir, silver_parquet, gold_parquet, chunksize)
+                for i, (_, path, schema) in enumerate(files)]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_process_bronze_file, *zip(*jobs)))
+        else:
+            results = [_process_bronze_file(*job) for job in jobs]
+
+        for source, rows, seconds in results:
+            stats = per_payer.setdefault(source, {"rows": 0, "seconds": 0.0})
+            stats["rows"] += rows
+            stats["seconds"] += seconds
+
+        # Parts are stitched together in file order so later corrections stay last
+        _concat_parts([os.path.join(parts_dir, f"{i:05d}_silver.csv") for i in range(len(files))],
+                      silver_path, COMMON_COLUMNS)
+        _concat_parts([os.path.join(parts_dir, f"{i:05d}_gold.csv") for i in range(len(files))],
+                      gold_path, COMMON_COLUMNS + ['text_representation'])
+    total = sum(stats["rows"] for stats in per_payer.values())
+
+    # Corrections in later payer files re-deliver claims; keep the latest version of each
+    claim_ids = pd.read_csv(gold_path, usecols=['claim_id'])['claim_id'].astype(str)
+    superseded = claim_ids.duplicated(keep='last')
+    if superseded.any():
+        duplicated_ids = set(claim_ids[superseded])
+        # Only the versions of re-delivered claims are loaded, one chunk at a time
+        versions = pd.concat([chunk[chunk['claim_id'].astype(str).isin(duplicated_ids)]
+                              for chunk in pd.read_csv(gold_path, chunksize=chunksize)], ignore_index=True)
+        versions['denial_reason'] = versions['denial_reason'].fillna('')
+        latest = versions.drop_duplicates(subset='claim_id', keep='last')
+        partitions = _partitions(versions)
+        _upsert_partitions(latest.drop(columns=['text_representation']), silver_parquet, partitions)
+        _upsert_partitions(latest, gold_parquet, partitions)
+        _dedupe_csv(silver_path)
+        _dedupe_csv(gold_path)
+        total = len(claim_ids) - int(superseded.sum())
+        print(f" Replaced {int(superseded.sum())} superseded claim versions")
+
+    elapsed = time.perf_counter() - start
+    print(f" Silver data saved to {silver_path} and {silver_parquet}/")
+    print(f" Gold data saved to {gold_path} and {gold_parquet}/")
+    for source, stats in per_payer.items():
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"   {source}: {stats['rows']} records in {stats['seconds']:.1f}s ({rate:.0f} rows/sec)")
+    print(f" Processed {total} records in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/sec)")
+
+    # A full rebuild covers every current bronze file
+    state = {"sources": {}}
+    _record_files(state, files, pd.read_csv(silver_path, usecols=['source', 'service_date']))
+    save_state(state, state_path)
+
+    if warehouse_path:
+        build_warehouse(gold_path, warehouse_path)
+    return total
+
+def data_version(path):
+    """Cheap version stamp of a gold file; changes whenever the ETL rewrites it."""
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def build_warehouse(gold_path=GOLD_PATH, db_path=WAREHOUSE_PATH, table_name='claims', con=None):
+    """
+    (Re)build the typed claims table in the persistent DuckDB warehouse. Rows are
+    sorted by service_date so DuckDB's per-row-group min/max zone maps can skip
+    data for date-range predicates. The gold data version is recorded in
+    _warehouse_meta so readers only rebuild when gold changes.
+    """
+    print(f" Building DuckDB table '{table_name}' in {db_path} from {gold_path}...")
+    start = time.perf_counter()
+    owns_connection = con is None
+    if owns_connection:
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        con = duckdb.connect(db_path)
+
+    # Incremental runs append corrected claims to gold, so keep the last row per claim_id
+    columns = ", ".join(f"'{name}': '{dtype}'" for name, dtype in GOLD_COLUMN_TYPES.items())
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {table_name} AS
+        SELECT * EXCLUDE (_line) FROM (
+            SELECT *, row_number() OVER () AS _line
+            FROM read_csv('{gold_path}', header = true, columns = {{{columns}}})
+        )
+        QUALIFY row_number() OVER (PARTITION BY claim_id ORDER BY _line DESC) = 1
+        ORDER BY service_date, claim_id
+    """)
+    con.execute(f"CREATE OR REPLACE TABLE {ROLLUP_TABLE} AS {_rollup_select(table_name)} ORDER BY service_month")
+    row_count = _record_warehouse_version(con, table_name, gold_path)
+    if owns_connection:
+        con.close()
+    print(f" Warehouse table '{table_name}' ready ({row_count} rows, {time.perf_counter() - start:.1f}s)")
+    return row_count
+
+def _rollup_select(table_name, months_table=None):
+    """Rollup rows for every month, or only the months listed in `months_table`."""
+    dimensions = ", ".join(d for d in ROLLUP_DIMENSIONS if d != 'service_month')
+    where = ""
+    if months_table:
+        where = (f"WHERE CAST(date_trunc('month', service_date) AS DATE) IN "
+                 f"(SELECT service_month FROM {months_table})")
+    return f"""
+        SELECT {dimensions}, CAST(date_trunc('month', service_date) AS DATE) AS service_month,
+               COUNT(*) AS claim_count, SUM(claim_amount) AS total_amount,
+               MIN(claim_amount) AS min_amount, MAX(claim_amount) AS max_amount
+        FROM {table_name}
+        {where}
+        GROUP BY ALL
+    """
+
+def _record_warehouse_version(con, table_name, gold_path):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _warehouse_meta (
+            table_name VARCHAR PRIMARY KEY, data_version VARCHAR, source_path VARCHAR,
+            row_count BIGINT, loaded_at TIMESTAMP
+        )
+    """)
+    row_count = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    con.execute(
+        "INSERT OR REPLACE INTO _warehouse_meta VALUES (?, ?, ?, ?, now())",
+        [table_name, data_version(gold_path), gold_path, row_count]
+    )
+    return row_count
+
+def _table_exists(con, table_name):
+    return bool(con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [table_name]).fetchone()[0])
+
+def upsert_warehouse(delta_gold, gold_path=GOLD_PATH, db_path=WAREHOUSE_PATH, table_name='claims', months=()):
+    """
+    Apply changed claims to the warehouse in place: replace their rows in
+    `claims` and recompute `claims_rollup` only for the service months they
+    (or their previous versions) fall in. Falls back to a full build when the
+    warehouse does not exist yet.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    con = duckdb.connect(db_path)
+    try:
+        if not _table_exists(con, table_name):
+            con.close()
+            con = None
+            return build_warehouse(gold_path, db_path, table_name)
+        start = time.perf_counter()
+        # Same typing as read_csv in build_warehouse, where empty strings load as NULL
+        typed = ", ".join(
+            f"NULLIF(CAST({name} AS VARCHAR), '') AS {name}" if dtype == 'VARCHAR' else f"CAST({name} AS {dtype}) AS {name}"
+            for name, dtype in GOLD_COLUMN_TYPES.items()
+        )
+        affected = {str(m)[:7] + '-01' for m in months} | set(delta_gold['service_date'].astype(str).str[:7] + '-01')
+        con.register('delta_gold', delta_gold[list(GOLD_COLUMN_TYPES)])
+        con.register('affected_months', pd.DataFrame({'month': sorted(affected)}))
+        con.execute("BEGIN TRANSACTION")
+        con.execute(f"DELETE FROM {table_name} WHERE claim_id IN (SELECT CAST(claim_id AS VARCHAR) FROM delta_gold)")
+        con.execute(f"INSERT INTO {table_name} BY NAME SELECT {typed} FROM delta_gold")
+        con.execute("CREATE TEMP TABLE _months AS SELECT CAST(month AS DATE) AS service_month FROM affected_months")
+        con.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE service_month IN (SELECT service_month FROM _months)")
+        con.execute(f"INSERT INTO {ROLLUP_TABLE} {_rollup_select(table_name, '_months')}")
+        row_count = _record_warehouse_version(con, table_name, gold_path)
+        con.execute("COMMIT")
+        print(f" Warehouse table '{table_name}' updated: {len(delta_gold)} claims, {len(affected)} rollup months "
+              f"({row_count} rows, {time.perf_counter() - start:.1f}s)")
+        return row_count
+    finally:
+        if con is not None:
+            con.close()
+
+def load_state(state_path=STATE_PATH):
+    if not os.path.exists(state_path):
+        return {"sources": {}}
+    with open(state_path) as f:
+        return json.load(f)
+
+def save_state(state, state_path=STATE_PATH):
+    state["updated_at"] = datetime.now().isoformat(timespec='seconds')
+    os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + '.tmp', state_path)
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def _record_files(state, files, df_silver):
+    for source, path, _ in files:
+        entry = state["sources"].setdefault(source, {"files": {}, "watermark": {}})
+        entry["files"][os.path.basename(path)] = _file_signature(path)
+        entry["watermark"]["file_mtime"] = max(entry["watermark"].get("file_mtime", 0), os.path.getmtime(path))
+    for source, max_date in df_silver.groupby('source')['service_date'].max().items():
+        entry = state["sources"].setdefault(source, {"files": {}, "watermark": {}})
+        entry["watermark"]["service_date"] = max(entry["watermark"].get("service_date", ""), str(max_date))
+
+def find_new_files(state, bronze_dir=BRONZE_DIR):
+    """Bronze files not in the manifest, or rewritten since they were processed."""
+    new_files = []
+    for source, path, schema in list_bronze_files(bronze_dir):
+        seen = state["sources"].get(source, {}).get("files", {}).get(os.path.basename(path))
+        if seen != _file_signature(path):
+            new_files.append((source, path, schema))
+    return new_files
+
+def _dedupe_csv(path):
+    """Rewrite a silver/gold CSV keeping the last row per claim_id, in file order, out of core in DuckDB."""
+    tmp_path = path + '.tmp'
+    con = duckdb.connect()
+    try:
+        con.execute(f"""
+            COPY (
+                SELECT * EXCLUDE (_line) FROM (
+                    SELECT *, row_number() OVER () AS _line
+                    FROM read_csv('{path}', header = true, all_varchar = true)
+                )
+                QUALIFY row_number() OVER (PARTITION BY claim_id ORDER BY _line DESC) = 1
+                ORDER BY _line
+            ) TO '{tmp_path}' (HEADER, DELIMITER ',')
+        """)
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+
+def _partitions(df):
+    return set(zip(df['source'], df['service_date'].astype(str).str[:7]))
+
+def _upsert_partitions(delta, root, partitions):
+    """Replace the rows of `delta`'s claims in the given partitions, reading only those partitions."""
+    for source, month in partitions:
+        partition_dir = os.path.join(root, f"source={source}", f"service_month={month}")
+        rows = delta[(delta['source'] == source) & (delta['service_date'].astype(str).str[:7] == month)]
+        if os.path.exists(partition_dir):
+            # Partition columns live in the path, not the files
+            existing = pd.read_parquet(partition_dir).assign(source=source)
+            existing = existing[~existing['claim_id'].astype(str).isin(delta['claim_id'].astype(str))]
+            rows = pd.concat([existing[delta.columns], rows], ignore_index=True)
+            shutil.rmtree(partition_dir)
+        if not rows.empty:
+            write_parquet(rows, root)
+
+def _previous_versions(claim_ids, gold_path, warehouse_path):
+    """
+    Current gold version of the given claims (claim_id, source, service_date,
+    text_representation), looked up by id in the warehouse when it exists or
+    streamed from the gold CSV by DuckDB otherwise, never loaded whole.
+    """
+    ids = pd.DataFrame({'claim_id': pd.Series(claim_ids, dtype=str)})
+    columns = "claim_id, source, CAST(service_date AS VARCHAR) AS service_date, text_representation"
+    if warehouse_path and os.path.exists(warehouse_path):
+        con = duckdb.connect(warehouse_path, read_only=True)
+        try:
+            if _table_exists(con, 'claims'):
+                con.register('delta_ids', ids)
+                return con.execute(
+                    f"SELECT {columns} FROM claims WHERE claim_id IN (SELECT claim_id FROM delta_ids)"
+                ).fetchdf()
+        finally:
+            con.close()
+    con = duckdb.connect()
+    try:
+        con.register('delta_ids', ids)
+        return con.execute(f"""
+            SELECT {columns} FROM (
+                SELECT *, row_number() OVER () AS _line FROM read_csv('{gold_path}', header = true, all_varchar = true)
+            )
+            WHERE claim_id IN (SELECT claim_id FROM delta_ids)
+            QUALIFY row_number() OVER (PARTITION BY claim_id ORDER BY _line DESC) = 1
+        """).fetchdf()
+    finally:
+        con.close()
+
+def run_incremental(bronze_dir=BRONZE_DIR, silver_path=SILVER_PATH, gold_path=GOLD_PATH,
+                    silver_parquet=SILVER_PARQUET, gold_parquet=GOLD_PARQUET,
+                    state_path=STATE_PATH, changeset_dir=CHANGESET_DIR, chunksize=100_000,
+                    warehouse_path=WAREHOUSE_PATH):
+    """
+    Process only bronze files that are new (or rewritten) since the last run and
+    upsert them into silver/gold by claim_id. Work is proportional to the delta:
+    previous versions are looked up by id, changed rows are appended to the
+    silver/gold CSVs (readers keep the last row per claim_id; a full run
+    compacts them), only the Parquet partitions touched by the delta are
+    rewritten, and the warehouse is updated in place. Writes a changeset (JSON
+    manifest + gold-format CSV of inserted/updated claims) for downstream
+    indexers and returns its path, or None when there was nothing to do.
+    """
+    state = load_state(state_path)
+    new_files = find_new_files(state, bronze_dir)
+    if not new_files or not os.path.exists(silver_path):
+        if not os.path.exists(silver_path):
+            print(" No existing silver data, running a full rebuild...")
+            run_etl(bronze_dir, silver_path, gold_path, silver_parquet, gold_parquet, chunksize,
+                    state_path=state_path, warehouse_path=warehouse_path)
+        else:
+            print(" No new bronze files. Silver/Gold are up to date.")
+        return None
+
+    print(f" Processing {len(new_files)} new bronze files: {[os.path.basename(p) for _, p, _ in new_files]}")
+    start = time.perf_counter()
+
+    # Later files win when the same claim appears more than once (corrections)
+    delta = pd.concat(list(iter_silver_chunks(chunksize=chunksize, files=new_files)), ignore_index=True)
+    delta = delta.drop_duplicates(subset='claim_id', keep='last').reset_index(drop=True)
+    delta_gold = delta.assign(text_representation=build_text_representation(delta))
+
+    delta_ids = delta_gold['claim_id'].astype(str)
+    previous = _previous_versions(delta_ids.unique(), gold_path, warehouse_path)
+
+    # Classify the delta against what gold already has; re-delivered identical rows are not changes.
+    # text_representation renders every claim field except source
+    inserted = ~delta_ids.isin(previous['claim_id'])
+    both = delta_gold.assign(claim_id=delta_ids).merge(previous, on='claim_id', suffixes=('', '_old'))
+    changed = ((both['text_representation'].astype(str) != both['text_representation_old'].astype(str))
+               | (both['source'].astype(str) != both['source_old'].astype(str)))
+    updated = delta_ids.isin(both.loc[changed, 'claim_id'])
+    changes = delta_gold[inserted | updated][COMMON_COLUMNS + ['text_representation']]
+    previous = previous[previous['claim_id'].isin(changes['claim_id'].astype(str))]
+
+    # Append only the changed claims; superseded rows stay until the next full run
+    changes.drop(columns=['text_representation']).to_csv(silver_path, mode='a', header=False, index=False)
+    changes.to_csv(gold_path, mode='a', header=False, index=False)
+
+    partitions = _partitions(changes) | _partitions(previous)
+    _upsert_partitions(changes.drop(columns=['text_representation']), silver_parquet, partitions)
+    _upsert_partitions(changes, gold_parquet, partitions)
+
+    _record_files(state, new_files, delta)
+    save_state(state, state_path)
+
+    if warehouse_path and not changes.empty:
+        upsert_warehouse(changes, gold_path, warehouse_path, months=previous['service_date'].astype(str))
+
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    os.makedirs(changeset_dir, exist_ok=True)
+    rows_path = os.path.join(changeset_dir, f"changeset_{stamp}.csv")
+    changeset_path = os.path.join(changeset_dir, f"changeset_{stamp}.json")
+    changes.to_csv(rows_path, index=False)
+    with open(changeset_path, 'w') as f:
+        json.dump({
+            "created_at": stamp,
+            "files": [os.path.basename(p) for _, p, _ in new_files],
+            "rows_path": rows_path,
+            "inserted": delta_gold.loc[inserted, 'claim_id'].tolist(),
+            "updated": delta_gold.loc[updated, 'claim_id'].tolist(),
+        }, f, indent=2)
+
+    elapsed = time.perf_counter() - start
+    print(f" Upserted {len(delta)} claims ({int(inserted.sum())} new, {int(updated.sum())} updated) "
+          f"in {elapsed:.1f}s, rewrote {len(partitions)} partitions")
+    print(f" Changeset written to {changeset_path}")
+    return changeset_path
+
 if __name__ == "__main__":
-    df_silver = process_bronze_to_silver()
-    process_silver_to_gold(df_silver)
+    parser = argparse.ArgumentParser(description="Bronze -> Silver -> Gold ETL")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process bronze files that are new since the last run")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to normalize independent payer files")
+    args = parser.parse_args()
+
+    if args.incremental:
+        run_incremental(chunksize=args.chunksize)
+    else:
+        run_etl(chunksize=args.chunksize, workers=args.workers)
@@ -0,0 +1,404 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.cache import LRUCache
+from src.metrics import METRICS
+from src.resources import async_chat_client, groq_chat_client
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+logger = logging.getLogger(__name__)
+
+
+class GroqChatClient:
+    """Thin wrapper around the Groq chat completions API. The SDK client is created on first call."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from groq import Groq
+
+            self._client = Groq(api_key=self.api_key or os.getenv("GROQ_API_KEY"))
+        return self._client
+
+    def complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        completion = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return completion.choices[0].message.content
+
+    def stream(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        chunks = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in chunks:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class AsyncChatClient:
+    """
+    Async client for an OpenAI-compatible chat completions endpoint (Groq by
+    default). One pooled HTTP client is shared by all requests on an event loop;
+    each call has a timeout, retries transient failures with exponential
+    backoff, and waits on a semaphore so at most `max_concurrency` requests
+    are in flight per loop.
+    """
+
+    RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, timeout: float = 30.0,
+                 max_retries: int = 3, backoff: float = 0.5, max_concurrency: int = 16):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL") or GROQ_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        # (client, semaphore) per event loop: both bind to the loop they are created on, and
+        # the client is shared by threads that each run their own loop (e.g. asyncio.run)
+        self._sessions: Dict[asyncio.AbstractEventLoop, Tuple] = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> Tuple:
+        import httpx
+
+        client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency)
+        )
+        return client, asyncio.Semaphore(self.max_concurrency)
+
+    async def _session(self) -> Tuple:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.get(loop)
+            if session is None:
+                session = self._sessions[loop] = self._new_session()
+            stale = [self._sessions.pop(old)[0] for old in list(self._sessions) if old.is_closed()]
+        # Pools left behind by finished loops are closed instead of leaked
+        for client in stale:
+            await self._close_client(client)
+        return session
+
+    @staticmethod
+    async def _close_client(client):
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Connections of a closed loop cannot always be shut down cleanly from another loop
+            logger.debug("Closing a stale HTTP client failed: %s", e)
+
+    @staticmethod
+    def _retry_after(value: Optional[str], default: float) -> float:
+        """Seconds to wait from a Retry-After header (delay in seconds or an HTTP date)."""
+        if value is None:
+            return default
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+    async def acomplete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        import httpx
+
+        client, semaphore = await self._session()
+        payload = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt) * (1 + random.random())
+            try:
+                async with semaphore:
+                    response = await client.post("/chat/completions", json=payload)
+                if response.status_code not in self.RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()["choices"][0]["message"]["content"]
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                delay = self._retry_after(response.headers.get("retry-after"), delay)
+            except (httpx.TimeoutException, httpx.TransportError):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        """Close the client of the running loop."""
+        with self._lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await self._close_client(session[0])
+
+
+class StubLLMClient:
+    """Offline stand-in for GroqChatClient, for tests and benchmarks."""
+
+    def __init__(self, responder: Optional[Callable[[List[Dict]], str]] = None, latency: float = 0.0):
+        self.responder = responder or self._default_response
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _default_response(messages: List[Dict]) -> str:
+        if "SQL" in messages[0]["content"]:
+            return "SELECT claim_status, COUNT(*) AS total_claims FROM claims GROUP BY claim_status"
+        return "Stub answer generated from the provided claims context."
+
+    def complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responder(messages)
+
+    async def acomplete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responder(messages)
+
+    def stream(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        content = self.complete(model, messages, temperature, max_tokens)
+        for i, word in enumerate(content.split(" ")):
+            yield word if i == 0 else " " + word
+
+
+class MemoryResponseCache:
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str):
+        self._cache.set(key, value)
+
+
+class SQLiteResponseCache:
+    """On-disk response cache so identical prompts survive restarts."""
+
+    def __init__(self, path: str = "data/llm_cache.sqlite", ttl: Optional[float] = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._con.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._con.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and row[1] + self.ttl < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._con.commit()
+
+
+class CachedLLMClient:
+    """
+    Wraps an LLM client with a response cache and coalesces concurrent
+    identical requests into a single upstream call. Cache hits and estimated
+    upstream token counts are reported to the metrics registry under `name`.
+    """
+
+    def __init__(self, client, cache=None, async_client=None, name: str = "llm"):
+        self.client = client
+        self.name = name
+        # Falls back to running the blocking client in a thread when no async client is given
+        self.async_client = async_client
+        self.cache = cache if cache is not None else MemoryResponseCache()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def _count_hit(self):
+        self.hits += 1
+        METRICS.inc("cache_requests_total", cache=f"llm_{self.name}", result="hit")
+
+    def _count_miss(self):
+        self.misses += 1
+        METRICS.inc("cache_requests_total", cache=f"llm_{self.name}", result="miss")
+
+    def _count_tokens(self, messages: List[Dict], content: str):
+        prompt = sum(estimate_tokens(m["content"]) for m in messages)
+        METRICS.inc("llm_tokens_total", prompt, pipeline=self.name, kind="prompt")
+        METRICS.inc("llm_tokens_total", estimate_tokens(content), pipeline=self.name, kind="completion")
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], temperature: float, max_tokens: int, fingerprint: str = "") -> str:
+        payload = json.dumps([model, messages, temperature, max_tokens, fingerprint], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def complete(self, model: str, messages: List[Dict], temperature: float = 0, max_tokens: int = 500,
+                 fingerprint: str = "") -> str:
+        key = self.make_key(model, messages, temperature, max_tokens, fingerprint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count_hit()
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self._count_miss()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            content = self.client.complete(model, messages, temperature, max_tokens)
+            self._count_tokens(messages, content)
+            self.cache.set(key, content)
+            future.set_result(content)
+            return content
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def acomplete(self, model: str, messages: List[Dict], temperature: float = 0, max_tokens: int = 500,
+                        fingerprint: str = "") -> str:
+        key = self.make_key(model, messages, temperature, max_tokens, fingerprint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count_hit()
+            return cached
+
+        future = self._ainflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        self._count_miss()
+        try:
+            if self.async_client is not None:
+                content = await self.async_client.acomplete(model, messages, temperature, max_tokens)
+            else:
+                content = await asyncio.to_thread(self.client.complete, model, messages, temperature, max_tokens)
+            self._count_tokens(messages, content)
+            self.cache.set(key, content)
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+    def stream(self, model: str, messages: List[Dict], temperature: float = 0, max_tokens: int = 500,
+               fingerprint: str = "", metrics: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Yield the response incrementally. A cached response is yielded in one
+        piece; a fresh one is cached only once the stream completes. If a
+        `metrics` dict is given it receives ttft_s, total_s, chunks and cached.
+        """
+        metrics = metrics if metrics is not None else {}
+        start = time.perf_counter()
+        key = self.make_key(model, messages, temperature, max_tokens, fingerprint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count_hit()
+            metrics.update(ttft_s=time.perf_counter() - start, total_s=time.perf_counter() - start,
+                           chunks=1, cached=True)
+            yield cached
+            return
+
+        self._count_miss()
+        parts = []
+        for delta in self.client.stream(model, messages, temperature, max_tokens):
+            if not parts:
+                metrics["ttft_s"] = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+        metrics.update(total_s=time.perf_counter() - start, chunks=len(parts), cached=False)
+        content = "".join(parts)
+        self._count_tokens(messages, content)
+        self.cache.set(key, content)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+def build_llm(llm=None, async_llm=None, response_cache=None, name: str = "llm") -> CachedLLMClient:
+    """
+    Default wiring for the pipelines: Groq for blocking and async calls unless
+    a client is injected. An injected client that also implements `acomplete`
+    (e.g. StubLLMClient) serves the async path too.
+    """
+    if llm is None:
+        # One shared Groq client and one shared async pool per process; neither connects until first use
+        return CachedLLMClient(groq_chat_client(), cache=response_cache,
+                               async_client=async_llm or async_chat_client(), name=name)
+    if async_llm is None and hasattr(llm, "acomplete"):
+        async_llm = llm
+    return CachedLLMClient(llm, cache=response_cache, async_client=async_llm, name=name)
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate (~4 characters per token, at least one per word/symbol)."""
+    return max(-(-len(text) // 4), len(re.findall(r"\w+|[^\w\s]", text)))
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans recorded by the current question, when a `trace()` is active
+_trace: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar("trace", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (the last finite bound for overflow)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms for the question pipelines.
+
+    `span(stage)` times a block into the `stage_seconds` histogram and, inside
+    an active `trace()`, also appends it to that trace so one question's stages
+    can be shown together. `render_prometheus()` produces the text exposition
+    format served by `start_metrics_server`.
+    """
+
+    def __init__(self, namespace: str = "claims"):
+        self.namespace = namespace
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Dict) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        trace = _trace.get()
+        if trace is not None:
+            trace.append({"counter": name, "value": value, **labels})
+
+    @contextmanager
+    def span(self, stage: str, **labels) -> Iterator[Dict]:
+        """Time the block as `stage`; the yielded dict can carry extra labels set inside the block."""
+        extra = {}
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            seconds = time.perf_counter() - start
+            # Merged explicitly so a label repeated in `extra` (or named "stage") cannot raise
+            merged = {**labels, **extra, "stage": stage}
+            self.observe("stage_seconds", seconds, **merged)
+            trace = _trace.get()
+            if trace is not None:
+                trace.append({**merged, "ms": seconds * 1000})
+
+    @contextmanager
+    def trace(self) -> Iterator[List[Dict]]:
+        """Collect the spans and counters recorded in this context (e.g. one chat question)."""
+        records: List[Dict] = []
+        token = _trace.set(records)
+        try:
+            yield records
+        finally:
+            _trace.reset(token)
+
+    def summary(self) -> List[Dict]:
+        """One row per stage histogram: count, mean and approximate p50/p95 in ms."""
+        with self._lock:
+            items = list(self._histograms.items())
+        rows = []
+        for (name, labels), h in sorted(items):
+            rows.append({**dict(labels), "count": h.count, "avg_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                         "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000})
+        return rows
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            items = list(self._counters.items())
+        return {name + self._format_labels(labels): value for (name, labels), value in sorted(items)}
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+        pairs = labels + extra
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.namespace}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{self._format_labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = f"{self.namespace}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {h.count}")
+            lines.append(f"{metric}_sum{self._format_labels(labels)} {h.sum}")
+            lines.append(f"{metric}_count{self._format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+def start_metrics_server(port: int = 9108, host: str = "127.0.0.1", registry: MetricsRegistry = METRICS) -> ThreadingHTTPServer:
+    """Serve `registry` at http://host:port/metrics on a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
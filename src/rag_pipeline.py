@@ -1,89 +1,490 @@
 import pandas as pd
-import chromadb
-from sentence_transformers import SentenceTransformer
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import List, Dict
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.cache import LRUCache
+from src.llm import DEFAULT_MODEL, build_llm, estimate_tokens, fingerprint
+from src.metrics import METRICS
+from src.rerank import mmr_select, normalize
+from src.resources import DEFAULT_CROSS_ENCODER, DEFAULT_EMBEDDING_MODEL, cross_encoder, embedding_model, vector_store
+
+logger = logging.getLogger(__name__)
+
+RAG_SYSTEM_PROMPT = "You are a helpful assistant answering questions based on provided insurance claims data."
+
+# Claim fields shown to the LLM, in column order; ingest-only fields (content_hash,
+# service_date_ord, source) and the verbatim text_representation are left out
+CONTEXT_COLUMNS = ("claim_id", "patient_name", "patient_id", "diagnosis", "procedure", "claim_amount",
+                   "claim_status", "denial_reason", "service_date", "specialty")
+
+# Answer length by question type, checked in order; anything else gets the default
+ANSWER_TOKEN_LIMITS = (
+    ("count", re.compile(r"^(how (many|much)|is|are|was|were|did|does|do)\b"), 120),
+    ("explain", re.compile(r"\b(why|explain|summari[sz]e|compare|reasons?|patterns?|trends?)\b"), 400),
+    ("list", re.compile(r"\b(list|show|which|what are|all)\b"), 300),
+)
+DEFAULT_ANSWER_TOKENS = 250
 
 class RAGPipeline:
-    def __init__(self, collection_name="insurance_claims"):
-        self.client = chromadb.Client()
+    EQUALITY_FILTERS = ("claim_status", "specialty", "source", "diagnosis")
+    RESULT_FIELDS = ("ids", "documents", "metadatas", "distances", "embeddings")
+    RERANKERS = (None, "mmr", "cross-encoder")
+
+    def __init__(self, collection_name="insurance_claims", persist_dir="data/vector_store",
+                 embedding_cache_size: int = 1024, retrieval_cache_size: int = 256,
+                 cache_ttl: Optional[float] = 600, llm=None, response_cache=None,
+                 backend: str = "chroma", quantization: Optional[str] = None, async_llm=None,
+                 model_name: str = DEFAULT_EMBEDDING_MODEL, rerank: Optional[str] = "mmr", fetch_k: int = 50,
+                 mmr_lambda: float = 0.7, dedup_threshold: Optional[float] = 0.97,
+                 cross_encoder_name: str = DEFAULT_CROSS_ENCODER, context_token_budget: int = 800,
+                 compact_context: bool = True, answer_max_tokens: Optional[int] = None):
+        # Persistent store so the index survives process restarts. backend is "chroma"
+        # or "numpy" (in-process brute force, optionally float16/int8 quantized)
+        if rerank not in self.RERANKERS:
+            raise ValueError(f"Unsupported reranker: {rerank}")
         self.collection_name = collection_name
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.collection = self.client.get_or_create_collection(name=self.collection_name)
-        
-    def ingest(self, csv_path: str):
-        print(f"📥 Loading data from {csv_path}...")
-        df = pd.read_csv(csv_path)
-        
-        # Check if already indexed
-        if self.collection.count() > 0:
-            print(f" Collection {self.collection_name} already has {self.collection.count()} documents. Skipping ingestion.")
-            return
-
-        documents = df['text_representation'].tolist()
-        ids = [str(i) for i in range(len(df))]
-        metadatas = df.drop(columns=['text_representation']).to_dict('records')
-        
-        # Convert all metadata values to strings to avoid ChromaDB issues with None/Int mix
-        for meta in metadatas:
-            for k, v in meta.items():
-                meta[k] = str(v)
+        self.model_name = model_name
+        self.backend = backend
+        self.persist_dir = persist_dir
+        self.store_options = {"quantization": quantization} if backend == "numpy" else {}
+        # Retrieval over-fetches fetch_k hits, drops near-duplicates and reranks them
+        # (MMR over the stored embeddings, or a cross-encoder) down to n_results
+        self.rerank = rerank
+        self.fetch_k = fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.dedup_threshold = dedup_threshold
+        self.cross_encoder_name = cross_encoder_name
+        # Retrieved claims go to the LLM as one compact table, trimmed to context_token_budget;
+        # answer_max_tokens overrides the per-question-type answer length
+        self.context_token_budget = context_token_budget
+        self.compact_context = compact_context
+        self.answer_max_tokens = answer_max_tokens
+        self.last_prompt_tokens = 0
+        # Bumped whenever ingest changes the index; part of every retrieval cache key
+        self.index_version = 0
+        self.embedding_cache = LRUCache(maxsize=embedding_cache_size, name="embedding")
+        self.retrieval_cache = LRUCache(maxsize=retrieval_cache_size, ttl=cache_ttl, name="retrieval")
+        self.llm = build_llm(llm, async_llm, response_cache, name="rag")
 
-        print(" Generating embeddings...")
-        embeddings = self.model.encode(documents).tolist()
-        
-        print("💾 Storing in Vector DB...")
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f" Indexed {len(documents)} documents.")
+    @property
+    def model(self):
+        # Loaded on first encode and shared process-wide (see src.resources)
+        return embedding_model(self.model_name)
+
+    @property
+    def store(self):
+        return vector_store(self.backend, self.persist_dir, self.collection_name, **self.store_options)
+
+    def count(self) -> int:
+        """Number of indexed claims, read from the vector store without loading the model."""
+        return self.store.count()
+
+    @staticmethod
+    def _content_hash(document: str, metadata: Dict) -> str:
+        payload = document + "|" + "|".join(f"{k}={metadata[k]}" for k in sorted(metadata))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _to_metadata(df: pd.DataFrame) -> List[Dict]:
+        # Keep native types so Chroma can filter on them: numbers stay numeric, text
+        # columns become strings, and service_date also gets a sortable YYYYMMDD int
+        df = df.copy()
+        for col in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[col]) or df[col].isna().all():
+                df[col] = df[col].fillna("").astype(str)
+        if 'service_date' in df.columns:
+            dates = pd.to_datetime(df['service_date'], errors='coerce')
+            df['service_date_ord'] = dates.dt.strftime('%Y%m%d').fillna("0").astype(int)
+        # Chroma rejects NaN/None, so drop missing numeric values per record
+        return [{k: v for k, v in rec.items() if v == v} for rec in df.to_dict('records')]
+
+    def _iter_batches(self, csv_path: str, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        # Incremental ETL runs append corrected claims, so gold can hold superseded rows;
+        # keep only the last row per claim_id across the whole file (one pass over the ids)
+        latest = ~pd.read_csv(csv_path, usecols=['claim_id'])['claim_id'].duplicated(keep="last").to_numpy()
+        offset = 0
+        # Stream the gold CSV so only one batch of rows/metadata is in memory at a time
+        for chunk in pd.read_csv(csv_path, chunksize=batch_size):
+            keep = latest[offset:offset + len(chunk)]
+            offset += len(chunk)
+            chunk = chunk[keep]
+            if chunk.empty:
+                continue
+            ids = chunk['claim_id'].astype(str).tolist()
+            documents = chunk['text_representation'].tolist()
+            metadatas = self._to_metadata(chunk.drop(columns=['text_representation']))
+            for doc, meta in zip(documents, metadatas):
+                meta["content_hash"] = self._content_hash(doc, meta)
+            yield ids, documents, metadatas
+
+    def _encode(self, documents: List[str], pool=None) -> List[List[float]]:
+        if pool is not None:
+            # Shards the batch across the worker processes and returns embeddings in input order
+            return self.model.encode_multi_process(documents, pool, batch_size=64).tolist()
+        return self.model.encode(documents, batch_size=64).tolist()
+
+    def ingest(self, csv_path: str, batch_size: int = 1000, workers: int = 1, prune: bool = True) -> Dict:
+        logger.info("Loading data from %s in batches of %d", csv_path, batch_size)
+
+        # One model instance per worker process, started once and reused for every batch
+        pool = None
+        if workers > 1:
+            logger.info("Starting embedding pool with %d workers", workers)
+            pool = self.model.start_multi_process_pool(target_devices=["cpu"] * workers)
+        try:
+            return self._ingest(csv_path, batch_size, pool, prune)
+        finally:
+            if pool is not None:
+                self.model.stop_multi_process_pool(pool)
+
+    def _ingest(self, csv_path: str, batch_size: int, pool, prune: bool) -> Dict:
+
+        # Diff against what is already indexed so only new/changed rows get embedded
+        indexed = self.store.get_hashes()
+        seen = set()
+        total_rows = 0
+        total_embedded = 0
+        start = time.perf_counter()
+
+        for ids, documents, metadatas in self._iter_batches(csv_path, batch_size):
+            seen.update(ids)
+            total_rows += len(ids)
+            changed = [i for i, doc_id in enumerate(ids) if indexed.get(doc_id) != metadatas[i]["content_hash"]]
+            if changed:
+                docs = [documents[i] for i in changed]
+                embeddings = self._encode(docs, pool)
+                self.store.upsert(
+                    documents=docs,
+                    embeddings=embeddings,
+                    metadatas=[metadatas[i] for i in changed],
+                    ids=[ids[i] for i in changed]
+                )
+                total_embedded += len(docs)
+
+            elapsed = time.perf_counter() - start
+            logger.info("Processed %d rows, embedded %d (%.1f docs/sec)",
+                        total_rows, total_embedded, total_embedded / elapsed if elapsed else 0)
+
+        # Without prune (e.g. a changeset) the CSV is a partial update, not the full set
+        removed = [doc_id for doc_id in indexed if doc_id not in seen] if prune else []
+        if removed:
+            logger.info("Removing %d documents no longer in %s", len(removed), csv_path)
+            for i in range(0, len(removed), batch_size):
+                self.store.delete(removed[i:i + batch_size])
+
+        self.store.flush()
+        if total_embedded or removed:
+            self.index_version += 1
+            self.retrieval_cache.clear()
+
+        elapsed = time.perf_counter() - start
+        docs_per_sec = total_embedded / elapsed if elapsed else 0.0
+        if total_embedded == 0 and not removed:
+            logger.info("Collection %s is up to date (%d documents)", self.collection_name, self.store.count())
+        else:
+            logger.info("Indexed %d documents in %.1fs (%.1f docs/sec, %d total)",
+                        total_embedded, elapsed, docs_per_sec, self.store.count())
+        return {
+            "rows": total_rows,
+            "embedded": total_embedded,
+            "removed": len(removed),
+            "seconds": elapsed,
+            "docs_per_sec": docs_per_sec,
+        }
+
+    def ingest_changeset(self, changeset_path: str, **kwargs) -> Dict:
+        """Apply an incremental ETL changeset (see etl.run_incremental) without a full re-scan."""
+        with open(changeset_path) as f:
+            changeset = json.load(f)
+        logger.info("Applying changeset %s (%d inserted, %d updated)",
+                    changeset_path, len(changeset['inserted']), len(changeset['updated']))
+        return self.ingest(changeset['rows_path'], prune=False, **kwargs)
+
+    @staticmethod
+    def _normalize_query(query_text: str) -> str:
+        return " ".join(query_text.lower().split())
+
+    def _embed_queries(self, query_texts: List[str]) -> List[Tuple[float, ...]]:
+        keys = [self._normalize_query(q) for q in query_texts]
+        embeddings = {key: self.embedding_cache.get(key) for key in keys}
+        # Encode all cache misses in a single batched model call
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing:
+            for key, vector in zip(missing, self.model.encode(missing, batch_size=64).tolist()):
+                embeddings[key] = tuple(vector)
+                self.embedding_cache.set(key, embeddings[key])
+        return [embeddings[key] for key in keys]
+
+    def _embed_query(self, query_text: str) -> Tuple[float, ...]:
+        return self._embed_queries([query_text])[0]
+
+    @staticmethod
+    def _date_ord(value) -> int:
+        return int(pd.Timestamp(value).strftime('%Y%m%d'))
+
+    @classmethod
+    def _build_where(cls, filters: Optional[Dict]) -> Optional[Dict]:
+        """
+        Translate structured filters into a Chroma `where` clause.
+
+        Supported keys: claim_status, specialty, source, diagnosis (a value or a
+        list of values), service_date_from / service_date_to (inclusive dates) and
+        claim_amount_min / claim_amount_max.
+        """
+        if not filters:
+            return None
+
+        clauses = []
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key in cls.EQUALITY_FILTERS:
+                if isinstance(value, (list, tuple, set)):
+                    clauses.append({key: {"$in": list(value)}})
+                else:
+                    clauses.append({key: {"$eq": value}})
+            elif key == "service_date_from":
+                clauses.append({"service_date_ord": {"$gte": cls._date_ord(value)}})
+            elif key == "service_date_to":
+                clauses.append({"service_date_ord": {"$lte": cls._date_ord(value)}})
+            elif key == "claim_amount_min":
+                clauses.append({"claim_amount": {"$gte": value}})
+            elif key == "claim_amount_max":
+                clauses.append({"claim_amount": {"$lte": value}})
+            else:
+                raise ValueError(f"Unsupported filter: {key}")
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
 
-    def query(self, query_text: str, n_results: int = 5) -> Dict:
-        print(f"🔍 Querying RAG for: '{query_text}'")
-        query_embedding = self.model.encode([query_text]).tolist()
+    @staticmethod
+    def _filters_key(filters: Optional[Dict]) -> Tuple:
+        if not filters:
+            return ()
+        return tuple(sorted(
+            (k, tuple(v) if isinstance(v, (list, tuple, set)) else str(v))
+            for k, v in filters.items() if v is not None
+        ))
+
+    def _cache_key(self, embedding: Tuple[float, ...], n_results: int, filters_key: Tuple) -> Tuple:
+        return (self.index_version, embedding, n_results, filters_key, self.rerank, self.fetch_k)
+
+    def _search(self, query_texts: List[str], embeddings: List[Tuple[float, ...]], n_results: int,
+                filters: Optional[Dict]) -> List[Dict]:
+        """One store query for all embeddings, then per-question reranking; results are shaped like `query`."""
+        fetch_k = max(self.fetch_k, n_results) if self.rerank else n_results
+        with METRICS.span("rag.search", batch=str(len(embeddings) > 1).lower()):
+            batch = self.store.query(
+                query_embeddings=[list(e) for e in embeddings],
+                n_results=fetch_k,
+                where=self._build_where(filters),
+                include_embeddings=self.rerank is not None
+            )
+        results = [
+            {field: [batch[field][j]] for field in self.RESULT_FIELDS if batch.get(field) is not None}
+            for j in range(len(embeddings))
+        ]
+        if self.rerank is None:
+            return results
+        with METRICS.span("rag.rerank", method=self.rerank):
+            return [self._rerank(q, e, r, n_results) for q, e, r in zip(query_texts, embeddings, results)]
+
+    def _rerank(self, query_text: str, embedding: Tuple[float, ...], result: Dict, n_results: int) -> Dict:
+        documents = result["documents"][0]
+        if not documents:
+            return {field: values for field, values in result.items() if field != "embeddings"}
+        vectors = normalize(result["embeddings"][0])
+        if self.rerank == "cross-encoder":
+            relevance = cross_encoder(self.cross_encoder_name).predict(
+                [(query_text, doc) for doc in documents], batch_size=64)
+            # Cross-encoder scores are not cosines, so rank on them alone and only use the embeddings to dedup
+            order = mmr_select(vectors, relevance, n_results, lambda_=1.0, dedup_threshold=self.dedup_threshold)
+        else:
+            relevance = vectors @ normalize(embedding)
+            order = mmr_select(vectors, relevance, n_results, self.mmr_lambda, self.dedup_threshold)
+        return {field: [[values[0][i] for i in order]] for field, values in result.items() if field != "embeddings"}
+
+    def query(self, query_text: str, n_results: int = 5, filters: Optional[Dict] = None) -> Dict:
+        logger.debug("Querying RAG for %r (filters: %s)", query_text, filters or {})
+        with METRICS.span("rag.embed"):
+            query_embedding = self._embed_query(query_text)
+
+        cache_key = self._cache_key(query_embedding, n_results, self._filters_key(filters))
+        results = self.retrieval_cache.get(cache_key)
+        if results is not None:
+            return results
         
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
+        results = self._search([query_text], [query_embedding], n_results, filters)[0]
+        self.retrieval_cache.set(cache_key, results)
         
         return results
 
-    def generate_answer(self, query_text: str, context_results: Dict) -> str:
-        from groq import Groq
-        import os
-        
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-        context_str = "\n\n".join(context_results['documents'][0])
-        
-        prompt = f"""
-        Context information is below.
-        ---------------------
-        {context_str}
-        ---------------------
-        Given the context information and not prior knowledge, answer the query.
-        Query: {query_text}
-        Answer:
+    def query_batch(self, query_texts: List[str], n_results: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
         """
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        Batched `query`: one model call for all uncached questions and one
+        multi-vector store query. Returns per-question results in input order,
+        each shaped like a single `query` result.
+        """
+        logger.debug("Querying RAG for %d questions (filters: %s)", len(query_texts), filters or {})
+        with METRICS.span("rag.embed", batch="true"):
+            embeddings = self._embed_queries(query_texts)
+        filters_key = self._filters_key(filters)
+
+        results = [None] * len(query_texts)
+        pending = {}
+        for i, embedding in enumerate(embeddings):
+            cache_key = self._cache_key(embedding, n_results, filters_key)
+            results[i] = self.retrieval_cache.get(cache_key)
+            if results[i] is None:
+                pending.setdefault(cache_key, []).append(i)
+
+        if pending:
+            texts = [query_texts[positions[0]] for positions in pending.values()]
+            batch = self._search(texts, [key[1] for key in pending], n_results, filters)
+            for single, (cache_key, positions) in zip(batch, pending.items()):
+                self.retrieval_cache.set(cache_key, single)
+                for i in positions:
+                    results[i] = single
+
+        return results
+
+    def cache_stats(self) -> Dict:
+        return {
+            "index_version": self.index_version,
+            "embedding": self.embedding_cache.stats(),
+            "retrieval": self.retrieval_cache.stats(),
+        }
+
+    @staticmethod
+    def _format_value(value) -> str:
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return str(value).replace("|", "/")
+
+    def _compact_context(self, documents: List[str], metadatas: List[Dict]) -> str:
+        """
+        Retrieved claims as one pipe-separated table in rank order. Values shared
+        by every claim are stated once above the table, denial_reason is only kept
+        when a claim was denied, and lower-ranked rows are dropped once the table
+        would exceed context_token_budget (the top claim is always kept).
+        """
+        if not metadatas or any(not m for m in metadatas):
+            # Results without metadata (e.g. an older index): trim the verbatim texts instead
+            rows, header = documents, []
+        else:
+            columns = [c for c in CONTEXT_COLUMNS if any(m.get(c) not in (None, "") for m in metadatas)]
+            if not any(m.get("claim_status") == "Denied" for m in metadatas) and "denial_reason" in columns:
+                columns.remove("denial_reason")
+            shared = [c for c in columns if len(metadatas) > 1 and len({str(m.get(c, "")) for m in metadatas}) == 1]
+            columns = [c for c in columns if c not in shared]
+            header = []
+            if shared:
+                header.append("All claims: " + "; ".join(f"{c}={self._format_value(metadatas[0][c])}" for c in shared))
+            header.append("|".join(columns))
+            rows = ["|".join(self._format_value(m.get(c, "")) for c in columns) for m in metadatas]
+
+        lines = list(header)
+        used = estimate_tokens("\n".join(lines))
+        for row in rows:
+            cost = estimate_tokens(row) + 1
+            if used + cost > self.context_token_budget and len(lines) > len(header):
+                break
+            lines.append(row)
+            used += cost
+        if len(lines) - len(header) < len(rows):
+            logger.debug("Context budget kept %d of %d claims", len(lines) - len(header), len(rows))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _prompt(context_str: str, query_text: str) -> str:
+        return (
+            "Context information is below.\n"
+            "---------------------\n"
+            f"{context_str}\n"
+            "---------------------\n"
+            "Given the context information and not prior knowledge, answer the query.\n"
+            f"Query: {query_text}\n"
+            "Answer:"
+        )
+
+    def _max_tokens(self, query_text: str) -> int:
+        if self.answer_max_tokens is not None:
+            return self.answer_max_tokens
+        question = self._normalize_query(query_text)
+        for _, pattern, limit in ANSWER_TOKEN_LIMITS:
+            if pattern.search(question):
+                return limit
+        return DEFAULT_ANSWER_TOKENS
+
+    def _answer_request(self, query_text: str, context_results: Dict) -> Dict:
+        documents = context_results['documents'][0]
+        verbatim = "\n\n".join(documents)
+        if self.compact_context:
+            metadatas = (context_results.get('metadatas') or [[]])[0] or []
+            context_str = self._compact_context(documents, metadatas)
+        else:
+            context_str = verbatim
+        prompt = self._prompt(context_str, query_text)
+
+        # Prompt size before (verbatim claim texts) and after compaction
+        system_tokens = estimate_tokens(RAG_SYSTEM_PROMPT)
+        verbatim_tokens = system_tokens + estimate_tokens(self._prompt(verbatim, query_text))
+        self.last_prompt_tokens = system_tokens + estimate_tokens(prompt)
+        METRICS.inc("rag_prompt_tokens_total", verbatim_tokens, kind="verbatim")
+        METRICS.inc("rag_prompt_tokens_total", self.last_prompt_tokens, kind="compact")
+        logger.debug("RAG prompt: ~%d tokens (~%d verbatim)", self.last_prompt_tokens, verbatim_tokens)
+
+        return dict(
+            model=DEFAULT_MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant answering questions based on provided insurance claims data."},
+                {"role": "system", "content": RAG_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.1,
-            max_tokens=500
+            max_tokens=self._max_tokens(query_text),
+            fingerprint=fingerprint(context_str)
         )
-        
-        return completion.choices[0].message.content
+
+    def _timed_answer_request(self, query_text: str, context_results: Dict) -> Dict:
+        with METRICS.span("rag.prompt_build"):
+            return self._answer_request(query_text, context_results)
+
+    def generate_answer(self, query_text: str, context_results: Dict) -> str:
+        request = self._timed_answer_request(query_text, context_results)
+        with METRICS.span("rag.llm"):
+            return self.llm.complete(**request)
+
+    def generate_answer_stream(self, query_text: str, context_results: Dict, metrics: Optional[Dict] = None) -> Iterator[str]:
+        metrics = metrics if metrics is not None else {}
+        request = self._timed_answer_request(query_text, context_results)
+        with METRICS.span("rag.llm", stream="true"):
+            yield from self.llm.stream(**request, metrics=metrics)
+        logger.debug("Answer streamed: TTFT %.2fs, total %.2fs", metrics.get('ttft_s', 0), metrics.get('total_s', 0))
+
+    async def aquery(self, query_text: str, n_results: int = 5, filters: Optional[Dict] = None) -> Dict:
+        # Embedding and vector search are CPU-bound; keep them off the event loop
+        return await asyncio.to_thread(self.query, query_text, n_results, filters)
+
+    async def agenerate_answer(self, query_text: str, context_results: Dict) -> str:
+        request = self._timed_answer_request(query_text, context_results)
+        with METRICS.span("rag.llm"):
+            return await self.llm.acomplete(**request)
+
+    async def aanswer(self, query_text: str, n_results: int = 5, filters: Optional[Dict] = None) -> Dict:
+        results = await self.aquery(query_text, n_results, filters)
+        answer = await self.agenerate_answer(query_text, results)
+        return {"answer": answer, "results": results}
 
 if __name__ == "__main__":
     # Test
+    logging.basicConfig(level=logging.INFO)
     rag = RAGPipeline()
     if os.path.exists('data/gold/claims_master.csv'):
         rag.ingest('data/gold/claims_master.csv')
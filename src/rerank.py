@@ -0,0 +1,35 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def mmr_select(vectors: np.ndarray, relevance: np.ndarray, k: int, lambda_: float = 0.7,
+               dedup_threshold: Optional[float] = None) -> List[int]:
+    """
+    Greedy maximal marginal relevance over normalized candidate `vectors`.
+
+    Each step picks the candidate maximizing
+    lambda_ * relevance - (1 - lambda_) * (max cosine to anything already picked);
+    lambda_=1 is plain relevance order. Candidates within `dedup_threshold`
+    cosine of a pick are dropped as near-duplicates, so fewer than `k`
+    indices may come back.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    selected = []
+    while len(selected) < k and available.any():
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        similarity = vectors @ vectors[pick]
+        redundancy = np.maximum(redundancy, similarity)
+        if dedup_threshold is not None:
+            available &= similarity < dedup_threshold
+    return selected
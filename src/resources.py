@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceManager:
+    """
+    Process-wide registry of expensive resources (models, DB connections, API
+    clients). Each one is created on first `get` and then shared by every
+    pipeline and Streamlit session in the process. Creation time is recorded
+    per resource so cold-start cost shows up in `stats()`.
+    """
+
+    def __init__(self):
+        self._resources: Dict[Hashable, Any] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.load_seconds: Dict[Hashable, float] = {}
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        # Per-key lock: concurrent first users wait for one load instead of each loading
+        with lock:
+            if key not in self._resources:
+                start = time.perf_counter()
+                self._resources[key] = factory()
+                self.load_seconds[key] = time.perf_counter() - start
+                logger.info("Loaded %s in %.2fs", key[0] if isinstance(key, tuple) else key, self.load_seconds[key])
+        return self._resources[key]
+
+    def loaded(self, key: Hashable) -> bool:
+        return key in self._resources
+
+    def stats(self) -> Dict[str, float]:
+        return {" ".join(map(str, k)) if isinstance(k, tuple) else str(k): s for k, s in self.load_seconds.items()}
+
+
+RESOURCES = ResourceManager()
+
+
+def embedding_model(name: str = DEFAULT_EMBEDDING_MODEL):
+    def load():
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(name)
+
+    return RESOURCES.get(("embedding_model", name), load)
+
+
+def cross_encoder(name: str = DEFAULT_CROSS_ENCODER):
+    def load():
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(name)
+
+    return RESOURCES.get(("cross_encoder", name), load)
+
+
+def duckdb_connection(db_path: str):
+    """One connection per database file; callers take cursors for concurrent work."""
+    import duckdb
+
+    return RESOURCES.get(("duckdb", db_path), lambda: duckdb.connect(database=db_path))
+
+
+def vector_store(backend: str, persist_dir: str, collection_name: str, **options):
+    from src.vector_store import create_vector_store
+
+    key = ("vector_store", backend, persist_dir, collection_name, tuple(sorted(options.items())))
+    return RESOURCES.get(key, lambda: create_vector_store(backend, persist_dir, collection_name, **options))
+
+
+def groq_chat_client():
+    from src.llm import GroqChatClient
+
+    return RESOURCES.get(("groq_client",), GroqChatClient)
+
+
+def async_chat_client():
+    # One pooled HTTP client and concurrency limit for every pipeline's async calls
+    from src.llm import AsyncChatClient
+
+    return RESOURCES.get(("async_chat_client",), AsyncChatClient)
@@ -0,0 +1,107 @@
+import re
+from typing import Optional
+
+import sqlglot
+from sqlglot import exp
+
+from src.etl import ROLLUP_DIMENSIONS, ROLLUP_TABLE
+
+# Measures stored on the rollup, and the columns the rewritten SQL may reference
+ROLLUP_MEASURES = ("claim_count", "total_amount", "min_amount", "max_amount")
+# Date functions that are exact at month granularity, so service_date -> service_month is safe
+MONTH_GRANULAR_UNITS = {"MONTH", "QUARTER", "YEAR"}
+MONTH_GRANULAR_FORMAT = re.compile(r"^([^%]|%[Yymb]|%B)*$")
+
+
+def _column(name: str) -> exp.Column:
+    return exp.column(name)
+
+
+def _rollup_aggregate(agg: exp.Expression) -> Optional[exp.Expression]:
+    """Re-express an aggregate over claims as an aggregate over the rollup measures."""
+    arg = agg.this
+    column = arg.name if isinstance(arg, exp.Column) else None
+
+    if isinstance(agg, exp.Count):
+        if isinstance(arg, exp.Star) or column == "claim_id":
+            return exp.Sum(this=_column("claim_count"))
+        return None
+    if column != "claim_amount":
+        return None
+    if isinstance(agg, exp.Sum):
+        return exp.Sum(this=_column("total_amount"))
+    if isinstance(agg, exp.Avg):
+        return exp.Paren(this=exp.Div(this=exp.Sum(this=_column("total_amount")),
+                                      expression=exp.Sum(this=_column("claim_count"))))
+    if isinstance(agg, exp.Min):
+        return exp.Min(this=_column("min_amount"))
+    if isinstance(agg, exp.Max):
+        return exp.Max(this=_column("max_amount"))
+    return None
+
+
+def _is_month_granular(node: exp.Expression) -> bool:
+    if isinstance(node, (exp.TimestampTrunc, exp.DateTrunc)):
+        return node.text("unit").upper() in MONTH_GRANULAR_UNITS
+    if isinstance(node, (exp.Month, exp.Year, exp.Quarter)):
+        return True
+    if isinstance(node, exp.Extract):
+        return node.this.name.upper() in MONTH_GRANULAR_UNITS
+    if isinstance(node, exp.TimeToStr):
+        return bool(MONTH_GRANULAR_FORMAT.match(node.text("format")))
+    return False
+
+
+def rewrite_to_rollup(sql: str, table_name: str = "claims") -> Optional[str]:
+    """
+    Rewrite an aggregate query over `table_name` to read from the rollup table,
+    or return None when the query cannot be answered exactly from it.
+
+    Routable queries read only the claims table (no joins, subqueries, windows
+    or DISTINCT), filter/group on rollup dimensions (service_date only through
+    month/quarter/year functions) and aggregate with COUNT(*), COUNT(claim_id)
+    or SUM/AVG/MIN/MAX(claim_amount).
+    """
+    try:
+        statements = sqlglot.parse(sql, read="duckdb")
+    except sqlglot.errors.ParseError:
+        return None
+    if len(statements) != 1 or not isinstance(statements[0], exp.Select):
+        return None
+
+    tree = statements[0].copy()
+    if any(tree.args.get(key) for key in ("joins", "with", "distinct", "laterals")):
+        return None
+    if any(isinstance(node, (exp.Select, exp.Union, exp.Window)) and node is not tree for node in tree.walk()):
+        return None
+    source = tree.find(exp.From)
+    if source is None or not isinstance(source.this, exp.Table) or source.this.name != table_name:
+        return None
+
+    aggregates = list(tree.find_all(exp.AggFunc))
+    if not aggregates:
+        return None
+    for agg in aggregates:
+        replacement = _rollup_aggregate(agg)
+        if replacement is None:
+            return None
+        agg.replace(replacement)
+        if isinstance(agg, exp.Count):
+            # COUNT is BIGINT and 0 over no rows; SUM widens the type and yields NULL, so restore both
+            target = replacement.parent if isinstance(replacement.parent, exp.Filter) else replacement
+            target.replace(exp.cast(exp.func("COALESCE", target.copy(), exp.Literal.number(0)), "BIGINT"))
+
+    aliases = {e.alias for e in tree.expressions if e.alias}
+    allowed = set(ROLLUP_DIMENSIONS) | set(ROLLUP_MEASURES) | aliases
+    for column in list(tree.find_all(exp.Column)):
+        column.set("table", None)
+        if column.name == "service_date":
+            if not _is_month_granular(column.parent):
+                return None
+            column.replace(_column("service_month"))
+        elif column.name not in allowed:
+            return None
+
+    source.this.replace(exp.to_table(ROLLUP_TABLE).as_(source.this.alias) if source.this.alias
+                        else exp.to_table(ROLLUP_TABLE))
+    return tree.sql(dialect="duckdb")
@@ -0,0 +1,184 @@
+import contextvars
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.metrics import METRICS
+from src.rerank import normalize
+
+logger = logging.getLogger(__name__)
+
+# Labeled example questions per route. Aggregations, counts and exact filters go
+# to SQL; explanations and free-text lookups over claim descriptions go to RAG.
+ROUTE_EXEMPLARS = {
+    "sql": [
+        "How many claims were denied last month?",
+        "Count approved claims by specialty",
+        "What is the total claim amount for cardiology in 2024?",
+        "Average claim amount by source",
+        "Top 10 diagnoses by number of claims",
+        "Show the monthly trend of denied claims",
+        "Which specialty has the highest denial rate?",
+        "List claims over $5000 submitted in Q4",
+        "What percentage of claims were approved?",
+        "Sum of claim amounts grouped by denial reason",
+        "How many pending claims are there per payer?",
+        "Show 5 denied claims for diabetes",
+    ],
+    "rag": [
+        "Why were claims for diabetes denied?",
+        "Explain the reasons behind recent orthopedic denials",
+        "Find claims similar to a knee replacement that was rejected",
+        "What kind of treatments do patients with asthma receive?",
+        "Summarize what happened with claims for chest pain",
+        "Are there any claims that mention missing documentation?",
+        "Describe typical dermatology claims",
+        "What do denied physiotherapy claims have in common?",
+        "Tell me about claims involving emergency surgery",
+        "Which claims look like duplicate submissions?",
+        "Give me examples of claims denied for lack of prior authorization",
+        "What are patients being treated for in neurology?",
+    ],
+}
+
+
+class QueryRouter:
+    """
+    Route each question to RAG, Text2SQL or both, by cosine similarity to the
+    labeled exemplars using the RAG pipeline's embedding model (and its cache).
+
+    A label's score is the mean similarity of its `top_k` closest exemplars;
+    when the two scores are within `margin` the question is ambiguous and
+    `answer` runs both pipelines concurrently. Decisions and latencies are kept
+    in `log` (the last `log_size`) and summarized by `route_report()`.
+    """
+
+    ROUTES = ("rag", "sql", "both")
+
+    def __init__(self, rag, t2s, exemplars: Optional[Dict[str, List[str]]] = None,
+                 margin: float = 0.03, top_k: int = 3, log_size: int = 1000):
+        self.rag = rag
+        self.t2s = t2s
+        self.exemplars = exemplars or ROUTE_EXEMPLARS
+        self.margin = margin
+        self.top_k = top_k
+        self.log = deque(maxlen=log_size)
+        self._labels = None
+        self._matrix = None
+
+    def _exemplar_matrix(self) -> Tuple[List[str], np.ndarray]:
+        # Embedded once, on first use, in a single batched model call
+        if self._matrix is None:
+            labels = [label for label, texts in self.exemplars.items() for _ in texts]
+            texts = [text for texts in self.exemplars.values() for text in texts]
+            self._labels = np.array(labels)
+            self._matrix = normalize(self.rag._embed_queries(texts))
+        return self._labels, self._matrix
+
+    def classify(self, question: str) -> Tuple[str, Dict[str, float]]:
+        """Return the route ("rag", "sql" or "both") and the per-label scores."""
+        with METRICS.span("router.classify"):
+            return self._classify(question)
+
+    def _classify(self, question: str) -> Tuple[str, Dict[str, float]]:
+        labels, matrix = self._exemplar_matrix()
+        similarities = matrix @ normalize(self.rag._embed_query(question))
+        scores = {}
+        for label in ("rag", "sql"):
+            top = np.sort(similarities[labels == label])[-self.top_k:]
+            scores[label] = float(top.mean())
+        if abs(scores["sql"] - scores["rag"]) < self.margin:
+            return "both", scores
+        return ("sql" if scores["sql"] > scores["rag"] else "rag"), scores
+
+    def _run_rag(self, question: str, filters: Optional[Dict]) -> Dict:
+        results = self.rag.query(question, filters=filters)
+        return {"answer": self.rag.generate_answer(question, results), "results": results}
+
+    def _run_sql(self, question: str) -> Dict:
+        sql_query = self.t2s.generate_sql(question)
+        result = self.t2s.execute_sql(sql_query)
+        if 'error' in result.columns:
+            raise RuntimeError(result['error'].iloc[0])
+        return {"sql": sql_query, "result": result}
+
+    def answer(self, question: str, route: Optional[str] = None, filters: Optional[Dict] = None,
+               strategy: str = "merge") -> Dict:
+        """
+        Answer a question on the classified (or given) route. For "both", the
+        pipelines run concurrently; `strategy` "first" returns the first one to
+        succeed, "merge" waits for both. Returns a dict with `route`, `scores`,
+        `served_by` (list of pipelines used), `latency_s`, and the `answer`/`results`
+        and/or `sql`/`result` of each pipeline that succeeded.
+        """
+        start = time.perf_counter()
+        scores = {}
+        if route is None:
+            route, scores = self.classify(question)
+        elif route not in self.ROUTES:
+            raise ValueError(f"Unknown route: {route}")
+        classify_s = time.perf_counter() - start
+
+        response = {"question": question, "route": route, "scores": scores, "served_by": [], "errors": {}}
+        runners = {"rag": lambda: self._run_rag(question, filters), "sql": lambda: self._run_sql(question)}
+        names = ["rag", "sql"] if route == "both" else [route]
+
+        # Not a context manager: with "first" the slower pipeline must not block the return
+        executor = ThreadPoolExecutor(max_workers=len(names))
+        # Each pipeline runs in a copy of this context so its spans join the caller's trace
+        pending = {executor.submit(contextvars.copy_context().run, runners[name]): name for name in names}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    response.update(future.result())
+                    response["served_by"].append(name)
+                except Exception as e:
+                    response["errors"][name] = str(e)
+            if strategy == "first" and response["served_by"]:
+                # The other pipeline finishes in the background; its result is dropped
+                break
+        executor.shutdown(wait=False)
+
+        response["latency_s"] = time.perf_counter() - start
+        self._record(response, classify_s)
+        return response
+
+    def _record(self, response: Dict, classify_s: float):
+        entry = {
+            "question": response["question"],
+            "route": response["route"],
+            "scores": response["scores"],
+            "served_by": list(response["served_by"]),
+            "errors": dict(response["errors"]),
+            "classify_ms": classify_s * 1000,
+            "latency_ms": response["latency_s"] * 1000,
+        }
+        self.log.append(entry)
+        METRICS.inc("routed_questions_total", route=entry["route"])
+        logger.info("Routed to %s (served by %s) in %.0f ms, classify %.1f ms", entry["route"],
+                    ", ".join(entry["served_by"]) or "none", entry["latency_ms"], entry["classify_ms"])
+
+    def record(self, question: str, route: str, scores: Dict[str, float], latency_s: float,
+               classify_s: float = 0.0):
+        """Log a decision for a question answered outside `answer` (e.g. streamed in the UI)."""
+        self._record({"question": question, "route": route, "scores": scores, "served_by": [route],
+                      "errors": {}, "latency_s": latency_s}, classify_s)
+
+    def route_report(self) -> Dict:
+        entries = list(self.log)
+        report = {"questions": len(entries)}
+        for route in self.ROUTES:
+            latencies = [e["latency_ms"] for e in entries if e["route"] == route]
+            report[route] = {
+                "count": len(latencies),
+                "share": len(latencies) / len(entries) if entries else 0.0,
+                "avg_latency_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+            }
+        report["avg_classify_ms"] = sum(e["classify_ms"] for e in entries) / len(entries) if entries else 0.0
+        return report
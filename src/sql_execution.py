@@ -0,0 +1,206 @@
+import math
+import threading
+from typing import Callable, Iterable, List, Optional
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+# Statements that write, even when nested inside an otherwise read-only query
+WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter, exp.Command)
+
+
+def validate_read_only(sql: str, tables: Iterable[str]) -> str:
+    """
+    Check that `sql` is a single read-only query over the given tables and
+    return it without a trailing semicolon. Raises ValueError otherwise.
+
+    Table functions (read_csv, ...), file paths and other databases are
+    rejected, since they would let a query read outside the warehouse.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(sql, read="duckdb") if s is not None]
+    except sqlglot.errors.ParseError as e:
+        raise ValueError(f"Could not parse SQL: {e}")
+    if len(statements) != 1:
+        raise ValueError("Expected exactly one SQL statement")
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        raise ValueError(f"Only SELECT queries are allowed, got {tree.key.upper()}")
+    if any(isinstance(node, WRITE_NODES) for node in tree.walk()):
+        raise ValueError("Query contains a write statement")
+
+    allowed = {t.lower() for t in tables}
+    allowed.update(cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE))
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier):
+            raise ValueError(f"Table functions are not allowed: {table.this.sql(dialect='duckdb')}")
+        if table.catalog or table.db not in ("", "main") or table.name.lower() not in allowed:
+            raise ValueError(f"Unknown table: {table.sql(dialect='duckdb')}")
+    return sql.strip().rstrip(";").strip()
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Normalize formatting, keyword/identifier case and comments so equivalent
+    spellings of a query share one cache key. Falls back to whitespace folding
+    when sqlglot cannot parse the SQL.
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read="duckdb")
+    except sqlglot.errors.ParseError:
+        return " ".join(sql.split()).rstrip(";")
+    return normalize_identifiers(tree, dialect="duckdb").sql(dialect="duckdb", comments=False)
+
+
+def run_with_timeout(con: duckdb.DuckDBPyConnection, action: Callable, timeout: Optional[float]):
+    """Run `action()` on `con`, interrupting the running statement after `timeout` seconds."""
+    if not timeout:
+        return action()
+    timer = threading.Timer(timeout, con.interrupt)
+    timer.start()
+    try:
+        return action()
+    except duckdb.InterruptException:
+        raise TimeoutError(f"Query exceeded the {timeout:g}s statement timeout")
+    finally:
+        timer.cancel()
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Arrow results as pandas with the dtypes DuckDB's fetchdf() gives: DECIMAL
+    columns become float64 (not Decimal objects) and dates become datetime64.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table.to_pandas(date_as_object=False)
+
+
+class ResultPager:
+    """
+    Lazily pages through a query result streamed as Arrow record batches.
+
+    Rows are only pulled from DuckDB as far as the requested page, and never
+    beyond `max_rows`. The total row count is a separate COUNT(*) query, run
+    on first use. The stream runs on its own cursor of `con`, so a timeout
+    interrupts only this query; the cursor is closed once the result is
+    drained or `close()` is called. A closed pager reopens the query (skipping
+    the rows already fetched) if a later page is requested.
+
+    Pass `table` to page through an already materialized (e.g. cached) result
+    instead of running `sql`; `on_complete` receives the fetched rows as one
+    Arrow table once the stream is drained or hits `max_rows`.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection, sql: str, page_size: int = 100,
+                 max_rows: int = 10_000, timeout: Optional[float] = 10.0, columns: Optional[List[str]] = None,
+                 table: Optional[pa.Table] = None, on_complete: Optional[Callable[[pa.Table], None]] = None):
+        self.con = con
+        self.sql = sql
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.on_complete = on_complete
+        self._total = None
+        self._cursor = None
+        self._reader = None
+
+        if table is not None:
+            self._complete = True
+            self.schema = table.schema
+            self._batches: List[pa.RecordBatch] = table.to_batches()
+            self._fetched = table.num_rows
+            return
+        self._complete = False
+        self._batches = []
+        self._fetched = 0
+        self._open()
+        self.schema = self._reader.schema
+        if columns is not None:
+            self.schema = pa.schema([field.with_name(name) for field, name in zip(self.schema, columns)])
+
+    def _open(self):
+        sql = self.sql if not self._fetched else f"SELECT * FROM ({self.sql}) AS _result OFFSET {self._fetched}"
+        cursor = self.con.cursor()
+        try:
+            self._reader = run_with_timeout(cursor, lambda: cursor.execute(sql).to_arrow_reader(self.page_size),
+                                            self.timeout)
+        except Exception:
+            cursor.close()
+            raise
+        self._cursor = cursor
+
+    @property
+    def exhausted(self) -> bool:
+        return self._complete
+
+    def _fetch_until(self, rows: int):
+        while not self._complete and self._fetched < min(rows, self.max_rows):
+            if self._reader is None:
+                self._open()
+            try:
+                batch = run_with_timeout(self._cursor, self._reader.read_next_batch, self.timeout)
+            except StopIteration:
+                self._finish()
+                break
+            batch = batch.slice(0, self.max_rows - self._fetched)
+            self._batches.append(pa.RecordBatch.from_arrays(batch.columns, schema=self.schema))
+            self._fetched += batch.num_rows
+        if self._fetched >= self.max_rows:
+            self._finish()
+
+    def _finish(self):
+        if self._complete:
+            return
+        self._complete = True
+        self.close()
+        if self.on_complete is not None:
+            self.on_complete(self.table())
+
+    def page(self, index: int) -> pd.DataFrame:
+        start = index * self.page_size
+        self._fetch_until(start + self.page_size)
+        return arrow_to_pandas(self.table().slice(start, self.page_size))
+
+    def table(self) -> pa.Table:
+        """The rows fetched so far, without copying the batches."""
+        return pa.Table.from_batches(self._batches, schema=self.schema)
+
+    def fetch_all(self) -> pd.DataFrame:
+        """Everything up to `max_rows` as one DataFrame."""
+        self._fetch_until(self.max_rows)
+        return arrow_to_pandas(self.table())
+
+    def total_rows(self) -> int:
+        if self._total is None:
+            if self.exhausted and self._fetched < self.max_rows:
+                self._total = self._fetched
+            else:
+                count_sql = f"SELECT COUNT(*) FROM ({self.sql}) AS _result"
+                cursor = self.con.cursor()
+                try:
+                    self._total = run_with_timeout(cursor, lambda: cursor.execute(count_sql).fetchone()[0], self.timeout)
+                finally:
+                    cursor.close()
+        return self._total
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_rows() > self.max_rows
+
+    def num_pages(self) -> int:
+        return max(1, math.ceil(min(self.total_rows(), self.max_rows) / self.page_size))
+
+    def close(self):
+        """Release the stream and its cursor; the rows fetched so far stay available."""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
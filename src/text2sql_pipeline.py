@@ -1,63 +1,210 @@
 import duckdb
+import logging
 import os
-from groq import Groq
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 import pandas as pd
+import pyarrow as pa
+
+from src.cache import LRUCache
+from src.etl import ROLLUP_TABLE, WAREHOUSE_PATH, build_warehouse, data_version
+from src.llm import DEFAULT_MODEL, build_llm, estimate_tokens, fingerprint
+from src.metrics import METRICS
+from src.resources import duckdb_connection
+from src.rollups import rewrite_to_rollup
+from src.sql_execution import ResultPager, arrow_to_pandas, canonicalize_sql, run_with_timeout, validate_read_only
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+SQL_SYSTEM_PROMPT = "You are an expert DuckDB SQL analyst. Output only one SQL query, no markdown or explanation."
+
+SQL_INSTRUCTIONS = """Rules:
+- Use ILIKE for string matching (e.g. claim_status ILIKE 'Approved').
+- Synonyms: accepted/paid -> 'Approved', rejected -> 'Denied'.
+- Use the listed values for categorical columns; column names are lowercase.
+- No LIMIT unless asked. Alias aggregations (e.g. COUNT(*) AS total_claims)."""
+
 class Text2SQLPipeline:
-    def __init__(self, db_path=':memory:'):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.con = duckdb.connect(database=db_path)
-        
+    # Categorical columns whose distinct values are worth showing the LLM
+    SAMPLE_VALUE_COLUMNS = ("claim_status", "specialty", "diagnosis", "denial_reason", "source")
+
+    def __init__(self, db_path=WAREHOUSE_PATH, llm=None, response_cache=None, async_llm=None,
+                 max_prompt_tokens: int = 600, max_distinct_values: int = 25,
+                 use_rollups: bool = True, rollup_shadow_rate: float = 0.05,
+                 statement_timeout: Optional[float] = 10.0, max_rows: int = 10_000,
+                 result_cache_size: int = 256, result_cache_bytes: int = 256 * 1024 * 1024):
+        self.llm = build_llm(llm, async_llm, response_cache, name="sql")
+        self.db_path = db_path
+        self._con = None
+        self.data_version = None
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_distinct_values = max_distinct_values
+        self.last_prompt_tokens = 0
+        self._schema_cache = {}
+        self.use_rollups = use_rollups
+        self.rollup_shadow_rate = rollup_shadow_rate
+        self.rollup_stats = {"queries": 0, "hits": 0, "rollup_ms": 0.0, "shadow_runs": 0, "shadow_saved_ms": 0.0}
+        # Shadow base-table timings run one at a time on a background thread, off the request path
+        self._stats_lock = threading.Lock()
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rollup-shadow")
+        self._shadow_pending = False
+        # Guards for running LLM-written SQL
+        self.statement_timeout = statement_timeout
+        self.max_rows = max_rows
+        # Arrow results keyed by (data version, canonical SQL), bounded by total bytes
+        self.result_cache = LRUCache(maxsize=result_cache_size, maxbytes=result_cache_bytes,
+                                     sizeof=lambda table: table.nbytes, name="sql_result")
+
+    @property
+    def con(self) -> duckdb.DuckDBPyConnection:
+        # Persistent warehouse built by the ETL; attached on first use and shared
+        # by every pipeline on the same file (see src.resources)
+        if self._con is None:
+            if self.db_path == ':memory:':
+                self._con = duckdb.connect(database=':memory:')
+            else:
+                os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+                self._con = duckdb_connection(self.db_path)
+        return self._con
+
+    def _fetch(self, sql: str, params: Optional[List] = None, one: bool = False):
+        # A cursor per call: the connection is shared by every session (see src.resources),
+        # and results fetched directly from it can interleave across threads
+        cursor = self.con.cursor()
+        try:
+            result = cursor.execute(sql, params or [])
+            return result.fetchone() if one else result.fetchall()
+        finally:
+            cursor.close()
+
+    def row_count(self, table_name: str = "claims") -> int:
+        """
+        Exact row count as recorded by build_warehouse/upsert_warehouse in
+        _warehouse_meta, falling back to COUNT(*) for tables loaded elsewhere.
+        """
+        try:
+            row = self._fetch("SELECT row_count FROM _warehouse_meta WHERE table_name = ?", [table_name], one=True)
+        except duckdb.CatalogException:
+            row = None
+        if row is None:
+            row = self._fetch(f"SELECT COUNT(*) FROM {table_name}", one=True)
+        return row[0]
+
+    def column_summary(self, table_name: str = "claims") -> Dict:
+        """Distinct values of the categorical columns and date ranges, cached per data version."""
+        context = self._schema_context(table_name)
+        return {"values": context["values"], "ranges": context["ranges"]}
+
+    def _loaded_version(self, table_name: str):
+        try:
+            row = self._fetch("SELECT data_version FROM _warehouse_meta WHERE table_name = ?", [table_name], one=True)
+        except duckdb.CatalogException:
+            return None
+        return row[0] if row else None
+
     def load_data(self, csv_path: str, table_name: str = "claims"):
-        print(f" Loading data from {csv_path} into DuckDB table '{table_name}'...")
-        # DuckDB can query CSV directly, but creating a table is cleaner for repeated queries
-        self.con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM read_csv_auto('{csv_path}')")
-        print(f" Data loaded. Schema:")
-        print(self.con.execute(f"DESCRIBE {table_name}").fetchdf())
+        version = data_version(csv_path)
+        if self._loaded_version(table_name) == version:
+            logger.info("Using existing DuckDB table '%s' (gold version %s)", table_name, version)
+        else:
+            # Gold changed (or first start): rebuild the typed table once
+            cursor = self.con.cursor()
+            try:
+                build_warehouse(csv_path, table_name=table_name, con=cursor)
+            finally:
+                cursor.close()
+        if version != self.data_version:
+            # Cached results belong to the old data; the version in the key already hides them
+            self.result_cache.clear()
+        self.data_version = version
 
-    def generate_sql(self, query_text: str) -> str:
-        print(f" Generating SQL for: '{query_text}'")
-        
-        # Get schema to inform the LLM
-        schema_df = self.con.execute("DESCRIBE claims").fetchdf()
-        columns = ", ".join([f"{row['column_name']} ({row['column_type']})" for _, row in schema_df.iterrows()])
-        
-        prompt = f"""
-        You are an expert SQL data analyst.
-        Table name: claims
-        Columns: {columns}
-        
-        User Question: {query_text}
-        
-        Instructions:
-        1. Write a valid DuckDB SQL query to answer the question.
-        2. Return ONLY the SQL query. No markdown, no explanations.
-        3. Do not use LIMIT unless specified.
-        4. ALWAYS use ILIKE for string matching to handle case sensitivity (e.g. claim_status ILIKE 'Approved').
-        5. Map synonyms to schema values:
-           - "accepted" -> 'Approved'
-           - "rejected" -> 'Denied'
-        6. Be aware that column names are lowercase (e.g., claim_status, diagnosis).
-        7. Alias aggregations for readability (e.g. SELECT COUNT(*) AS total_claims ...).
+    def _schema_context(self, table_name: str = "claims") -> Dict:
         """
+        Schema description plus sample values for low-cardinality text columns,
+        computed once per table version (the warehouse data version).
+        """
+        key = (table_name, self.data_version)
+        if key in self._schema_cache:
+            return self._schema_cache[key]
+
+        schema = self._fetch(f"DESCRIBE {table_name}")
+        columns = ", ".join(f"{name} {dtype}" for name, dtype, *_ in schema)
+        text_columns = [name for name, dtype, *_ in schema if dtype == "VARCHAR" and name in self.SAMPLE_VALUE_COLUMNS]
+        counts = ()
+        if text_columns:
+            counts = self._fetch(
+                "SELECT " + ", ".join(f"approx_count_distinct({c})" for c in text_columns) + f" FROM {table_name}",
+                one=True
+            )
+
+        values = {}
+        for column, count in zip(text_columns, counts):
+            if count <= self.max_distinct_values:
+                rows = self._fetch(
+                    f"SELECT DISTINCT {column} FROM {table_name} WHERE {column} IS NOT NULL AND {column} <> '' ORDER BY 1"
+                )
+                values[column] = [r[0] for r in rows]
+        date_columns = [name for name, dtype, *_ in schema if dtype == "DATE"]
+        ranges = {
+            c: self._fetch(f"SELECT MIN({c}), MAX({c}) FROM {table_name}", one=True) for c in date_columns
+        }
+
+        context = {"table": table_name, "columns": columns, "values": values, "ranges": ranges}
+        self._schema_cache[key] = context
+        return context
+
+    def _schema_prompt(self, context: Dict, query_text: str) -> str:
+        """Assemble the prompt from precomputed fragments, within max_prompt_tokens."""
+        fixed = [
+            f"Table: {context['table']}({context['columns']})",
+            *(f"{c} range: {lo} to {hi}" for c, (lo, hi) in context["ranges"].items()),
+        ]
+        tail = [SQL_INSTRUCTIONS, f"Question: {query_text}"]
+        values = {c: f"{c} values: " + ", ".join(v) for c, v in context["values"].items()}
+
+        # Sample values help accuracy but are optional: drop the longest lists first
+        prompt = "\n".join(fixed + list(values.values()) + tail)
+        for column in sorted(values, key=lambda c: len(values[c]), reverse=True):
+            if estimate_tokens(prompt) <= self.max_prompt_tokens:
+                break
+            del values[column]
+            prompt = "\n".join(fixed + list(values.values()) + tail)
+        return prompt
+
+    def _timed_schema_context(self) -> Dict:
+        with METRICS.span("sql.schema_context"):
+            return self._schema_context()
+
+    def generate_sql(self, query_text: str) -> str:
+        return self._generate_sql(query_text, self._timed_schema_context())
+
+    def _sql_request(self, query_text: str, context: Dict) -> Dict:
+        with METRICS.span("sql.prompt_build"):
+            prompt = self._schema_prompt(context, query_text)
+        self.last_prompt_tokens = estimate_tokens(SQL_SYSTEM_PROMPT) + estimate_tokens(prompt)
+        logger.debug("SQL prompt: ~%d tokens", self.last_prompt_tokens)
         
-        import re
-        
-        completion = self.client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        return dict(
+            model=DEFAULT_MODEL,
             messages=[
-                {"role": "system", "content": "You are a SQL generator. Output only SQL."},
+                {"role": "system", "content": SQL_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0,
-            max_tokens=200
+            max_tokens=200,
+            fingerprint=fingerprint(context["columns"], str(self.data_version))
         )
-        
-        content = completion.choices[0].message.content.strip()
-        
+
+    @staticmethod
+    def _extract_sql(content: str) -> str:
+        content = content.strip()
         # Try to find SQL in code blocks first
         match = re.search(r'```sql\n(.*?)\n```', content, re.DOTALL)
         if match:
@@ -69,17 +216,221 @@ class Text2SQLPipeline:
             
         return sql_query
 
+    def _generate_sql(self, query_text: str, context: Dict) -> str:
+        logger.debug("Generating SQL for %r", query_text)
+        request = self._sql_request(query_text, context)
+        with METRICS.span("sql.llm"):
+            return self._extract_sql(self.llm.complete(**request))
+
+    def generate_sql_stream(self, query_text: str, metrics: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Stream the raw LLM output for display. The completed response is cached,
+        so a following `generate_sql` for the same question returns the parsed SQL
+        without another round trip.
+        """
+        logger.debug("Generating SQL for %r", query_text)
+        request = self._sql_request(query_text, self._timed_schema_context())
+        with METRICS.span("sql.llm", stream="true"):
+            yield from self.llm.stream(**request, metrics=metrics)
+
+    async def agenerate_sql(self, query_text: str) -> str:
+        logger.debug("Generating SQL for %r", query_text)
+        request = self._sql_request(query_text, self._timed_schema_context())
+        with METRICS.span("sql.llm"):
+            content = await self.llm.acomplete(**request)
+        return self._extract_sql(content)
+
+    def _execute_on_rollup(self, sql_query: str) -> Optional[pa.Table]:
+        """Run an aggregate query on the rollup table when it is exactly answerable there."""
+        rewritten = rewrite_to_rollup(sql_query)
+        if rewritten is None:
+            return None
+        start = time.perf_counter()
+        # A cursor per call, so a timeout interrupts only this query and not other sessions on the shared connection
+        cursor = self.con.cursor()
+        try:
+            result = run_with_timeout(cursor, lambda: cursor.execute(rewritten).fetch_arrow_table(),
+                                      self.statement_timeout)
+            # Binding the original query (without running it) gives the column names the user expects
+            result = result.rename_columns(cursor.sql(sql_query).columns)
+        except Exception as e:
+            logger.warning("Rollup query failed, using base table: %s", e)
+            return None
+        finally:
+            cursor.close()
+        self._record_rollup_hit(sql_query, rewritten, (time.perf_counter() - start) * 1000)
+        return result
+
+    def _record_rollup_hit(self, sql_query: str, rewritten: str, rollup_ms: float):
+        with self._stats_lock:
+            self.rollup_stats["hits"] += 1
+            self.rollup_stats["rollup_ms"] += rollup_ms
+        logger.debug("Routed to %s: %s (%.1f ms)", ROLLUP_TABLE, rewritten, rollup_ms)
+        self._maybe_shadow(sql_query, rollup_ms)
+
+    def _maybe_shadow(self, sql_query: str, rollup_ms: float):
+        """Occasionally time the base-table query in the background to measure the latency saved."""
+        with self._stats_lock:
+            if self._shadow_pending:
+                return
+            if self.rollup_stats["shadow_runs"] and random.random() >= self.rollup_shadow_rate:
+                return
+            self._shadow_pending = True
+        self._shadow_executor.submit(self._shadow_run, sql_query, rollup_ms)
+
+    def _shadow_run(self, sql_query: str, rollup_ms: float):
+        cursor = self.con.cursor()
+        try:
+            start = time.perf_counter()
+            run_with_timeout(cursor, lambda: cursor.execute(sql_query).fetchall(), self.statement_timeout)
+            base_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self.rollup_stats["shadow_runs"] += 1
+                self.rollup_stats["shadow_saved_ms"] += base_ms - rollup_ms
+        except Exception as e:
+            logger.debug("Shadow base-table query skipped: %s", e)
+        finally:
+            cursor.close()
+            with self._stats_lock:
+                self._shadow_pending = False
+
+    def rollup_report(self) -> Dict:
+        stats = self.rollup_stats
+        avg_saved_ms = stats["shadow_saved_ms"] / stats["shadow_runs"] if stats["shadow_runs"] else 0.0
+        return {
+            "queries": stats["queries"],
+            "rollup_hits": stats["hits"],
+            "hit_rate": stats["hits"] / stats["queries"] if stats["queries"] else 0.0,
+            "avg_rollup_ms": stats["rollup_ms"] / stats["hits"] if stats["hits"] else 0.0,
+            "avg_saved_ms": avg_saved_ms,
+            "est_total_saved_ms": avg_saved_ms * stats["hits"],
+        }
+
+    def _readable_tables(self) -> List[str]:
+        # Everything in the warehouse except bookkeeping tables such as _warehouse_meta
+        rows = self._fetch("SELECT table_name FROM duckdb_tables() WHERE NOT internal")
+        return [name for name, in rows if not name.startswith("_")]
+
+    def validate_sql(self, sql_query: str) -> str:
+        """Raise ValueError unless the SQL is a single read-only query over warehouse tables."""
+        return validate_read_only(sql_query, self._readable_tables())
+
+    def open_result(self, sql_query: str, page_size: int = 100) -> ResultPager:
+        """
+        Validate the SQL and start streaming its result; pages are fetched on
+        demand, up to max_rows. Raises ValueError for rejected SQL and
+        TimeoutError when a statement exceeds statement_timeout.
+        """
+        with METRICS.span("sql.validate"):
+            sql_query = self.validate_sql(sql_query)
+        key = self._result_key(sql_query)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return ResultPager(self.con, sql_query, page_size, self.max_rows, self.statement_timeout, table=cached)
+
+        def store(table: pa.Table):
+            self.result_cache.set(key, table)
+
+        rewritten = None
+        if self.use_rollups:
+            with self._stats_lock:
+                self.rollup_stats["queries"] += 1
+            rewritten = rewrite_to_rollup(sql_query)
+        if rewritten is not None:
+            try:
+                with METRICS.span("sql.open", route="rollup"):
+                    columns = self._result_columns(sql_query)
+                    # Aggregates are computed before the first batch streams, so opening covers the query
+                    start = time.perf_counter()
+                    pager = ResultPager(self.con, rewritten, page_size, self.max_rows,
+                                        self.statement_timeout, columns=columns, on_complete=store)
+                self._record_rollup_hit(sql_query, rewritten, (time.perf_counter() - start) * 1000)
+                return pager
+            except duckdb.Error as e:
+                logger.warning("Rollup query failed, using base table: %s", e)
+        with METRICS.span("sql.open", route="base"):
+            return ResultPager(self.con, sql_query, page_size, self.max_rows, self.statement_timeout,
+                               on_complete=store)
+
+    def _result_columns(self, sql_query: str) -> List[str]:
+        # Binds the query without running it
+        cursor = self.con.cursor()
+        try:
+            return cursor.sql(sql_query).columns
+        finally:
+            cursor.close()
+
+    def _result_key(self, sql_query: str):
+        return (self.data_version, self.max_rows, canonicalize_sql(sql_query))
+
+    def cache_stats(self) -> Dict:
+        return {"data_version": self.data_version, "result": self.result_cache.stats()}
+
     def execute_sql(self, sql_query: str) -> pd.DataFrame:
-        print(f" Executing SQL: {sql_query}")
+        logger.debug("Executing SQL: %s", sql_query)
         try:
-            result = self.con.execute(sql_query).fetchdf()
+            with METRICS.span("sql.validate"):
+                sql_query = self.validate_sql(sql_query)
+            key = self._result_key(sql_query)
+            with METRICS.span("sql.execute") as span:
+                span["route"] = "cache"
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    return arrow_to_pandas(cached)
+
+                if self.use_rollups:
+                    with self._stats_lock:
+                        self.rollup_stats["queries"] += 1
+                    span["route"] = "rollup"
+                    table = self._execute_on_rollup(sql_query)
+                    if table is not None:
+                        # Same Arrow -> pandas conversion as the base route, so dtypes do not depend on the route
+                        self.result_cache.set(key, table)
+                        return arrow_to_pandas(table)
+                span["route"] = "base"
+                pager = ResultPager(self.con, sql_query, page_size=self.max_rows, max_rows=self.max_rows,
+                                    timeout=self.statement_timeout)
+                try:
+                    result = pager.fetch_all()
+                finally:
+                    pager.close()
+            self.result_cache.set(key, pager.table())
+            if len(result) == self.max_rows:
+                logger.info("Result capped at %d rows", self.max_rows)
             return result
         except Exception as e:
-            print(f" SQL Execution Failed: {e}")
+            logger.warning("SQL execution failed: %s", e)
             return pd.DataFrame({'error': [str(e)]})
 
+    def run_batch(self, questions: List[str], max_concurrency: int = 4) -> List[Dict]:
+        """
+        Generate and execute SQL for many questions. LLM calls run with bounded
+        concurrency; SQL runs on this pipeline's single DuckDB connection.
+        Returns one dict per question, in input order, with `error` set on failure.
+        """
+        context = self._timed_schema_context()
+        results = [{"question": q, "sql": None, "result": None, "error": None} for q in questions]
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {executor.submit(self._generate_sql, q, context): i for i, q in enumerate(questions)}
+            for future in as_completed(futures):
+                item = results[futures[future]]
+                try:
+                    item["sql"] = future.result()
+                except Exception as e:
+                    item["error"] = f"SQL generation failed: {e}"
+                    continue
+                result = self.execute_sql(item["sql"])
+                if 'error' in result.columns:
+                    item["error"] = result['error'].iloc[0]
+                else:
+                    item["result"] = result
+
+        return results
+
 if __name__ == "__main__":
     # Test
+    logging.basicConfig(level=logging.INFO)
     t2s = Text2SQLPipeline()
     if os.path.exists('data/gold/claims_master.csv'):
         t2s.load_data('data/gold/claims_master.csv')
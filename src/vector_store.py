@@ -0,0 +1,260 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ChromaVectorStore:
+    """Vector store backed by a persistent Chroma collection."""
+
+    def __init__(self, persist_dir: str, collection_name: str):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=persist_dir)
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get_hashes(self, page_size: int = 5000) -> Dict[str, str]:
+        # claim_id -> content_hash for everything currently in the collection, paged
+        hashes = {}
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for doc_id, meta in zip(page["ids"], page["metadatas"]):
+                hashes[doc_id] = (meta or {}).get("content_hash", "")
+            if len(page["ids"]) < page_size:
+                return hashes
+            offset += page_size
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def flush(self):
+        pass
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[Dict] = None,
+              include_embeddings: bool = False) -> Dict:
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where,
+                                     include=include)
+
+
+class NumpyVectorStore:
+    """
+    In-process brute-force vector store.
+
+    Normalized embeddings live in one contiguous matrix that is memory-mapped
+    from disk; a query is a blocked matmul plus argpartition. `quantization`
+    may be None (float32), "float16" or "int8" (per-row scale). Distances are
+    reported as 1 - cosine similarity.
+    """
+
+    QUANTIZATIONS = (None, "float16", "int8")
+
+    def __init__(self, persist_dir: str, collection_name: str, quantization: Optional[str] = None,
+                 block_size: int = 65536):
+        if quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.path = os.path.join(persist_dir, collection_name)
+        self.quantization = quantization
+        self.block_size = block_size
+        os.makedirs(self.path, exist_ok=True)
+
+        self.vectors = np.zeros((0, 0), dtype=self._dtype)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.records = pd.DataFrame(columns=["_id", "_document"])
+        self._load()
+
+        # Upserts/deletes are buffered and folded into the matrix on the next query/flush
+        self._pending = []
+        self._deleted = set()
+        self._dirty = False
+
+    @property
+    def _dtype(self):
+        return {None: np.float32, "float16": np.float16, "int8": np.int8}[self.quantization]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if not os.path.exists(self._file("manifest.json")):
+            return
+        with open(self._file("manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest["quantization"] != self.quantization:
+            raise ValueError(f"Index at {self.path} was built with quantization={manifest['quantization']}")
+        self.vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+        self.scales = np.load(self._file("scales.npy"), mmap_mode="r")
+        self.records = pd.read_pickle(self._file("records.pkl"))
+
+    def _quantize(self, embeddings: np.ndarray):
+        if self.quantization == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(embeddings / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return embeddings.astype(self._dtype), np.ones(len(embeddings), dtype=np.float32)
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def count(self) -> int:
+        self._consolidate()
+        return len(self.records)
+
+    def get_hashes(self, page_size: int = 5000) -> Dict[str, str]:
+        self._consolidate()
+        if "content_hash" not in self.records.columns:
+            return {doc_id: "" for doc_id in self.records["_id"]}
+        return dict(zip(self.records["_id"], self.records["content_hash"].fillna("")))
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        vectors, scales = self._quantize(self._normalize(embeddings))
+        records = pd.DataFrame(metadatas)
+        records.insert(0, "_document", documents)
+        records.insert(0, "_id", ids)
+        self._deleted.difference_update(ids)
+        self._pending.append((vectors, scales, records))
+        self._dirty = True
+
+    def delete(self, ids: List[str]):
+        self._deleted.update(ids)
+        self._dirty = True
+
+    def _consolidate(self):
+        if not self._pending and not self._deleted:
+            return
+        vectors = [np.asarray(self.vectors)] if len(self.records) else []
+        scales = [np.asarray(self.scales)] if len(self.records) else []
+        records = [self.records] if len(self.records) else []
+        for v, s, r in self._pending:
+            vectors.append(v)
+            scales.append(s)
+            records.append(r)
+        if not records:
+            self._deleted = set()
+            return
+
+        all_records = pd.concat(records, ignore_index=True)
+        # Last write wins for re-upserted ids; deleted ids are dropped
+        keep = ~all_records["_id"].duplicated(keep="last") & ~all_records["_id"].isin(self._deleted)
+        keep = keep.to_numpy()
+        self.vectors = np.ascontiguousarray(np.concatenate(vectors)[keep])
+        self.scales = np.concatenate(scales)[keep]
+        self.records = all_records[keep].reset_index(drop=True)
+        self._pending = []
+        self._deleted = set()
+
+    def flush(self):
+        self._consolidate()
+        if not self._dirty:
+            return
+        for name, array in (("vectors.npy", self.vectors), ("scales.npy", self.scales)):
+            np.save(self._file(name + ".tmp"), array)
+            os.replace(self._file(name + ".tmp.npy"), self._file(name))
+        self.records.to_pickle(self._file("records.pkl"))
+        with open(self._file("manifest.json"), "w") as f:
+            json.dump({"quantization": self.quantization, "count": len(self.records)}, f)
+        # Re-open the matrix as a memory map so the heap copy can be released
+        self.vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+        self.scales = np.load(self._file("scales.npy"), mmap_mode="r")
+        self._dirty = False
+
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        if "$and" in where:
+            return np.logical_and.reduce([self._where_mask(w) for w in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._where_mask(w) for w in where["$or"]])
+
+        masks = []
+        for field, condition in where.items():
+            if field not in self.records.columns:
+                masks.append(np.zeros(len(self.records), dtype=bool))
+                continue
+            column = self.records[field]
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$eq":
+                    masks.append((column == value).to_numpy())
+                elif op == "$ne":
+                    masks.append((column != value).to_numpy())
+                elif op == "$in":
+                    masks.append(column.isin(value).to_numpy())
+                elif op == "$nin":
+                    masks.append(~column.isin(value).to_numpy())
+                elif op == "$gt":
+                    masks.append((column > value).to_numpy())
+                elif op == "$gte":
+                    masks.append((column >= value).to_numpy())
+                elif op == "$lt":
+                    masks.append((column < value).to_numpy())
+                elif op == "$lte":
+                    masks.append((column <= value).to_numpy())
+                else:
+                    raise ValueError(f"Unsupported where operator: {op}")
+        return np.logical_and.reduce(masks)
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        # Blocked so quantized matrices are only ever widened to float32 one block at a time;
+        # float32 blocks are used as-is and only int8 rows carry a scale
+        n = len(self.records) if rows is None else len(rows)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        scaled = self.quantization == "int8"
+        for start in range(0, n, self.block_size):
+            stop = min(start + self.block_size, n)
+            positions = slice(start, stop) if rows is None else rows[start:stop]
+            block = self.vectors[positions]
+            scores[:, start:stop] = queries @ block.astype(np.float32, copy=False).T
+            if scaled:
+                scores[:, start:stop] *= self.scales[positions]
+        return scores
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[Dict] = None,
+              include_embeddings: bool = False) -> Dict:
+        """`include_embeddings` adds the stored (normalized, dequantized) vectors of the hits."""
+        self._consolidate()
+        queries = self._normalize(query_embeddings)
+        rows = np.flatnonzero(self._where_mask(where)) if where else None
+
+        scores = self._scores(queries, rows)
+        k = min(n_results, scores.shape[1])
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            results["embeddings"] = []
+        for row_scores in scores:
+            if k == 0:
+                top = np.array([], dtype=int)
+            else:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                top = top[np.argsort(-row_scores[top])]
+            positions = top if rows is None else rows[top]
+            records = self.records.iloc[positions]
+            metadatas = records.drop(columns=["_id", "_document"]).to_dict("records")
+            results["ids"].append(records["_id"].tolist())
+            results["documents"].append(records["_document"].tolist())
+            results["metadatas"].append([{k: v for k, v in m.items() if v == v} for m in metadatas])
+            results["distances"].append((1.0 - row_scores[top]).tolist())
+            if include_embeddings:
+                vectors = self.vectors[positions].astype(np.float32) * self.scales[positions][:, None]
+                results["embeddings"].append(vectors.tolist())
+        return results
+
+
+def create_vector_store(backend: str, persist_dir: str, collection_name: str, **kwargs):
+    if backend == "chroma":
+        return ChromaVectorStore(persist_dir, collection_name)
+    if backend == "numpy":
+        return NumpyVectorStore(os.path.join(persist_dir, "numpy"), collection_name, **kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")